@@ -52,7 +52,7 @@ def check_dependencies():
         return False
     
     try:
-        result = subprocess.run([str(venv_python), "-c", "import PIL, pandas"], 
+        result = subprocess.run([str(venv_python), "-c", "import PIL"], 
                               capture_output=True, text=True, check=True)
         return True
     except subprocess.CalledProcessError:
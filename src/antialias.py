@@ -0,0 +1,81 @@
+"""
+自适应抗锯齿：在原生抗锯齿、2倍、4倍超采样之间选择；auto 模式按字号档位挑选
+满足质量阈值（相对 4 倍超采样参考）的最低倍数
+"""
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+# 模式 -> 超采样倍数（native 即 FreeType 原生抗锯齿，不做缩放）
+ANTIALIAS_MODES = {"native": 1, "2x": 2, "4x": 4}
+AUTO_MODE = "auto"
+DEFAULT_ANTIALIAS_MODE = "4x"
+REFERENCE_FACTOR = 4
+
+# auto 模式允许的相对覆盖率误差（%）：|候选 - 参考| 之和 / 参考墨量之和
+DEFAULT_QUALITY_THRESHOLD = 3.0
+
+# 校准字形：覆盖常见笔画密度和标点
+CALIBRATION_CHARS = "心理学焦虑感，我"
+
+
+def render_glyph_mask(font_registry, char, font_size, factor):
+    """以指定倍数渲染单个字形的覆盖率蒙版，便于逐像素比较
+
+    各倍数共用同一个缩回原生尺寸后落在整像素上的原点，并以基线定位（按倍数放大的字号，
+    其上行高度取整结果不同，按顶部定位会让候选与参考错开零点几个像素）。
+    """
+    canvas = int(font_size * 1.6)
+    origin = ((font_size // 4) * factor, (font_size * 5 // 4) * factor)
+    mask = Image.new("L", (canvas * factor, canvas * factor), 0)
+    ImageDraw.Draw(mask).text(origin, char, font=font_registry.get(font_size * factor), fill=255, anchor="ls")
+    if factor > 1:
+        mask = mask.resize((canvas, canvas), Image.Resampling.LANCZOS)
+    return mask
+
+
+def coverage_error(mask, reference):
+    """相对覆盖率误差（%）"""
+    ink = ImageStat.Stat(reference).sum[0]
+    if not ink:
+        return 0.0
+    return ImageStat.Stat(ImageChops.difference(mask, reference)).sum[0] / ink * 100
+
+
+class AntialiasPolicy:
+    """决定每个字号使用的超采样倍数"""
+
+    def __init__(self, font_registry, mode=DEFAULT_ANTIALIAS_MODE, threshold=DEFAULT_QUALITY_THRESHOLD):
+        if mode != AUTO_MODE and mode not in ANTIALIAS_MODES:
+            raise ValueError(f"未知的抗锯齿模式: {mode}（可选: {', '.join([*ANTIALIAS_MODES, AUTO_MODE])}）")
+        self.font_registry = font_registry
+        self.mode = mode
+        self.threshold = threshold
+        self._auto_factors = {}
+
+    def factor_for(self, font_size):
+        """返回该字号的超采样倍数"""
+        if self.mode != AUTO_MODE:
+            return ANTIALIAS_MODES[self.mode]
+        factor = self._auto_factors.get(font_size)
+        if factor is None:
+            factor = self._auto_factors[font_size] = self.calibrate(font_size)[0]
+        return factor
+
+    def calibrate(self, font_size):
+        """逐级尝试更低的倍数，返回 (满足阈值的最低倍数, {倍数: 误差})"""
+        references = [render_glyph_mask(self.font_registry, ch, font_size, REFERENCE_FACTOR)
+                      for ch in CALIBRATION_CHARS]
+        errors = {}
+        for factor in sorted(f for f in ANTIALIAS_MODES.values() if f < REFERENCE_FACTOR):
+            candidates = [render_glyph_mask(self.font_registry, ch, font_size, factor)
+                          for ch in CALIBRATION_CHARS]
+            errors[factor] = sum(coverage_error(mask, ref) for mask, ref in zip(candidates, references)) / len(references)
+            if errors[factor] <= self.threshold:
+                return factor, errors
+        return REFERENCE_FACTOR, errors
+
+    def describe(self):
+        """策略参数（写入构建清单，变化时触发重新渲染）"""
+        if self.mode == AUTO_MODE:
+            return {"mode": self.mode, "threshold": self.threshold}
+        return {"mode": self.mode}
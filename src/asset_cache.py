@@ -0,0 +1,100 @@
+"""
+预缩放资源的磁盘缓存：按 (源文件哈希, 目标尺寸) 保存版式实际使用尺寸的图标，
+源文件变化时自动失效，启动时不再解码和缩放数 MB 的原图
+"""
+
+import os
+
+from PIL import Image
+
+from manifest import file_sha256
+
+# 缓存文件使用低压缩级别的 PNG：无损，解码远快于原图
+CACHE_COMPRESS_LEVEL = 1
+HASH_PREFIX_LENGTH = 16
+
+
+class AssetCache:
+    """预缩放图标缓存，构造时不做任何 I/O"""
+
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}  # 源文件路径 -> (mtime_ns, 文件大小, 哈希)，同一进程内只哈希一次
+
+    def _source_hash(self, source_path):
+        stat = os.stat(source_path)
+        cached = self._hashes.get(source_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = file_sha256(source_path)[:HASH_PREFIX_LENGTH]
+        self._hashes[source_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _cache_path(self, source_path, size, digest):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{stem}_{digest}_{size[0]}x{size[1]}.png")
+
+    def get(self, source_path, size):
+        """返回缩放到 size 的 RGBA 图像（与直接 LANCZOS 缩放逐像素相同）"""
+        size = tuple(size)
+        if not self.enabled:
+            return self._scale(source_path, size)
+
+        digest = self._source_hash(source_path)
+        path = self._cache_path(source_path, size, digest)
+        try:
+            with Image.open(path) as cached:
+                image = cached.convert("RGBA")
+            if image.size == size:
+                self.hits += 1
+                return image
+        except (OSError, ValueError):
+            pass
+
+        self.misses += 1
+        image = self._scale(source_path, size)
+        self._store(path, image, source_path, digest)
+        return image
+
+    @staticmethod
+    def _scale(source_path, size):
+        with Image.open(source_path) as source:
+            return source.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+
+    def _store(self, path, image, source_path, digest):
+        """原子写入缓存，并删除同一源文件旧版本的缓存；缓存目录不可写时静默跳过"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            image.save(tmp_path, "PNG", compress_level=CACHE_COMPRESS_LEVEL)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._prune_stale(source_path, digest)
+
+    def _prune_stale(self, source_path, digest):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        prefix = f"{stem}_"
+        for name in os.listdir(self.cache_dir):
+            rest = name[len(prefix):] if name.startswith(prefix) else ""
+            # 文件名形如 {stem}_{哈希}_{宽}x{高}.png；同名源文件的旧哈希即为过期缓存
+            if rest.count("_") == 1 and not rest.startswith(digest + "_") and rest.endswith(".png"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def clear(self):
+        """删除全部缓存文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        return {"cache_dir": self.cache_dir, "enabled": self.enabled, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,351 @@
+"""
+渲染流水线分阶段基准测试：分别测量渐变、网格图案、各字号档位的超采样文字、柔和面板、
+图标粘贴、编码以及整张卡片的耗时，结果输出为 JSON（中位数 / p95 / 内存峰值）
+
+用法:
+    python benchmark.py                          # 默认 5 次迭代，写入 output/benchmark.json
+    python benchmark.py --iterations 20 --output bench.json
+    python benchmark.py --baseline old.json      # 与历史结果对比，中位数变慢超过阈值时返回非零
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import PIL
+
+import main_antialiasing as card
+from antialias import ANTIALIAS_MODES, AUTO_MODE
+from asset_cache import AssetCache
+from encoders import PRESETS, get_encoder
+from gradient import clear_gradient_cache, create_gradient_bg
+from linebreak import LineBreaker
+from profiling import read_status_kb, reset_peak_rss
+from quotes_io import iter_quotes
+from shadows import alpha_of, shadow_sprite
+
+# 合成语料的正文长度：覆盖 get_optimal_font_size 的全部档位
+SYNTHETIC_LENGTHS = (12, 30, 45, 70, 110, 160, 220)
+SYNTHETIC_SEED = 20240101
+
+# 每个字号档位取一个代表长度
+FONT_BUCKET_LENGTHS = (20, 40, 70, 100, 150)
+
+# 典型的正文/反思面板尺寸
+PANEL_SIZES = {"main": (1760, 1500), "reflection": (1480, 520)}
+
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+# ========== 计时 ==========
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(stage, func, iterations, setup=None, **meta):
+    """重复执行 func(setup()) 并统计耗时和内存峰值
+
+    Pillow 的像素缓冲区不经过 tracemalloc，因此同时记录 Python 堆峰值和进程 RSS 峰值增量。
+    """
+    durations = []
+    tracemalloc.reset_peak()
+    rss_tracked = reset_peak_rss()
+    rss_base = read_status_kb("VmRSS") if rss_tracked else None
+
+    for i in range(iterations):
+        arg = setup(i) if setup else i
+        start = time.perf_counter()
+        func(arg)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    rss_peak = read_status_kb("VmHWM") if rss_tracked else None
+    result = {
+        "stage": stage,
+        "iterations": iterations,
+        "median_ms": round(statistics.median(durations), 3),
+        "p95_ms": round(_percentile(durations, 95), 3),
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "min_ms": round(min(durations), 3),
+        "max_ms": round(max(durations), 3),
+        "python_peak_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+        "rss_peak_delta_kb": max(0, rss_peak - rss_base) if rss_peak is not None and rss_base is not None else None,
+    }
+    result.update(meta)
+    return result
+
+
+# ========== 语料 ==========
+def load_baseline_corpus(quotes_path=card.quotes_path):
+    """真实语料 quotes.csv"""
+    return list(iter_quotes(quotes_path))
+
+
+def build_synthetic_corpus(reference_rows, count=None, seed=SYNTHETIC_SEED):
+    """按真实语料的字符集生成不同长度的合成语录（结果可复现）"""
+    charset = sorted({ch for row in reference_rows for ch in row["content"] if not ch.isspace()})
+    if not charset:
+        charset = list("每天一点心理学焦虑安全感情绪自我认知成长改变")
+    rng = random.Random(seed)
+    count = count or len(SYNTHETIC_LENGTHS)
+
+    corpus = []
+    for i in range(count):
+        length = SYNTHETIC_LENGTHS[i % len(SYNTHETIC_LENGTHS)]
+        corpus.append({
+            "id": f"synthetic-{i + 1}",
+            "content": "".join(rng.choice(charset) for _ in range(length)),
+            "reflection": "".join(rng.choice(charset) for _ in range(rng.randint(10, 60))),
+        })
+    return corpus
+
+
+# ========== 各阶段 ==========
+def run_benchmarks(iterations, corpus, baseline_rows, encode_presets):
+    results = []
+    assets = card.load_assets()
+    W, H = card.IMG_WIDTH, card.IMG_HEIGHT
+    top, bottom = card.BACKGROUND_TOP, card.BACKGROUND_BOTTOM
+
+    def cold_gradient(_):
+        clear_gradient_cache()
+        return _
+
+    results.append(measure("gradient_cold", lambda _: create_gradient_bg(W, H, top, bottom),
+                           iterations, setup=cold_gradient))
+    results.append(measure("gradient_cached", lambda _: create_gradient_bg(W, H, top, bottom), iterations))
+
+    # 主题分类：整份语料单次扫描
+    texts = [row["content"] for row in baseline_rows + corpus]
+    results.append(measure("theme_classify", lambda _: [card.extract_theme_keyword(text) for text in texts],
+                           iterations, texts=len(texts)))
+
+    results.append(measure("subtle_pattern", lambda base: card.draw_subtle_pattern(base, W, H),
+                           iterations, setup=lambda _: create_gradient_bg(W, H, top, bottom)))
+
+    # 图标载入：预缩放缓存命中 vs 每次解码原图并缩放
+    uncached = AssetCache(card.asset_cache_dir, enabled=False)
+    for name, cache in (("icon_load_uncached", uncached), ("icon_load_cached", card.asset_cache)):
+        results.append(measure(name, lambda _, cache=cache: [
+            cache.get(path, size) for path, size in ((card.logo_path, card.brand_logo_size),
+                                                     (card.theme_icon_path, card.theme_icon_size),
+                                                     (card.home_icon_path, card.home_icon_size))], iterations))
+
+    results.append(measure("chrome_layer", lambda _: card.create_chrome_layer(assets["logo"], assets["theme_icon"]),
+                           iterations))
+
+    # 超采样文字：每个字号档位一项，每次迭代前清空蒙版缓存以测量真实光栅化开销
+    sample_text = "".join(row["content"] for row in corpus)
+    for length in FONT_BUCKET_LENGTHS:
+        font_size = card.get_optimal_font_size(length)
+        text = card.line_breaker.fill(sample_text[:length], font_size, card.MAIN_TEXT_WIDTH)
+
+        def clear_masks(i):
+            card.text_mask_cache.clear()
+            return i
+
+        results.append(measure(
+            f"text_supersampling_{font_size}px",
+            lambda _, text=text, font_size=font_size: card.render_text_with_supersampling(
+                text, font_size, card.TEXT_COLOR_MAIN, 1.8),
+            iterations, setup=clear_masks, font_size=font_size, text_length=length,
+            supersample=card.antialias_policy.factor_for(font_size)))
+
+    # 字形图集后端：图集预热后每次只做拼贴（内存拷贝）
+    card.configure_text_backend("atlas")
+    for length in FONT_BUCKET_LENGTHS:
+        font_size = card.get_optimal_font_size(length)
+        text = card.line_breaker.fill(sample_text[:length], font_size, card.MAIN_TEXT_WIDTH)
+
+        def clear_masks(i):
+            card.text_mask_cache.clear()
+            return i
+
+        card.render_text_with_supersampling(text, font_size, card.TEXT_COLOR_MAIN, 1.8)
+        results.append(measure(
+            f"text_atlas_{font_size}px",
+            lambda _, text=text, font_size=font_size: card.render_text_with_supersampling(
+                text, font_size, card.TEXT_COLOR_MAIN, 1.8),
+            iterations, setup=clear_masks, font_size=font_size, text_length=length))
+    card.configure_text_backend(card.TEXT_BACKEND)
+    card.text_mask_cache.clear()
+
+    # 按像素断行：冷启动（新建字宽表）vs 字宽表已缓存，整份语料各断一遍
+    def break_corpus(breaker):
+        for row in corpus:
+            font_size = card.get_optimal_font_size(len(row["content"]))
+            breaker.fill(row["content"], font_size, card.MAIN_TEXT_WIDTH)
+
+    results.append(measure("line_break_cold", lambda _: break_corpus(LineBreaker(card.font_registry)), iterations,
+                           quotes=len(corpus)))
+    results.append(measure("line_break_cached", lambda _: break_corpus(card.line_breaker), iterations,
+                           quotes=len(corpus)))
+
+    for name, (width, height) in PANEL_SIZES.items():
+        results.append(measure(
+            f"soft_panel_{name}",
+            lambda _, width=width, height=height: card.create_soft_panel(
+                width, height, (252, 250, 248, 25), (240, 240, 240, 35), (230, 230, 230, 20)),
+            iterations, width=width, height=height))
+
+    home_icon = assets["home_icon"]
+
+    def paste_icon(canvas):
+        card.shadow_cache.paste(canvas, ("home_icon", home_icon.size), lambda: alpha_of(home_icon), 14,
+                                (0, 0, 0, 70), (836, 3006))
+        canvas.paste(home_icon, (830, 3000), home_icon)
+
+    # 投影贴图：首次生成（模糊）vs 缓存命中后的粘贴
+    results.append(measure("shadow_sprite_build", lambda _: shadow_sprite(alpha_of(home_icon), 14, (0, 0, 0, 70)),
+                           iterations))
+    results.append(measure("icon_paste", paste_icon, iterations,
+                           setup=lambda _: assets["chrome_layer"].copy()))
+
+    sample_card = card.render_quote(corpus[0], assets, log=lambda *_: None)
+    for preset in encode_presets:
+        encoder = get_encoder(preset=preset)
+        sizes = []
+
+        def encode(_, encoder=encoder, sizes=sizes):
+            data, _seconds = encoder.encode(sample_card, dpi=card.DPI)
+            sizes.append(len(data))
+
+        entry = measure(f"encode_{preset}", encode, iterations, encoder=encoder.name)
+        entry["bytes"] = sizes[-1]
+        results.append(entry)
+
+    # 整张卡片：渲染 + 默认编码，逐条轮换语料
+    raw_encoder = get_encoder()
+    for corpus_name, rows in (("synthetic", corpus), ("quotes_csv", baseline_rows)):
+        if not rows:
+            continue
+
+        def render_card(i, rows=rows):
+            card.text_mask_cache.clear()
+            bg = card.render_quote(rows[i % len(rows)], assets, log=lambda *_: None)
+            raw_encoder.encode(bg, dpi=card.DPI)
+
+        results.append(measure(f"end_to_end_{corpus_name}", render_card, iterations,
+                               corpus=corpus_name, corpus_size=len(rows)))
+
+    # 省内存模式：RGB 整帧 + 包围盒内混合
+    rgb_assets = card.load_assets(canvas_mode="RGB")
+
+    def render_rgb(i):
+        card.text_mask_cache.clear()
+        bg = card.render_quote(corpus[i % len(corpus)], rgb_assets, log=lambda *_: None)
+        raw_encoder.encode(bg, dpi=card.DPI)
+
+    results.append(measure("end_to_end_rgb_canvas", render_rgb, iterations, canvas_mode="RGB"))
+    del rgb_assets
+
+    # 缩放预览：同一条渲染路径，1/4 线性尺寸
+    preview_assets = card.load_assets(card.PREVIEW_SCALE)
+
+    def render_preview(i):
+        card.text_mask_cache.clear()
+        card.render_quote(corpus[i % len(corpus)], preview_assets, log=lambda *_: None)
+
+    results.append(measure("end_to_end_preview", render_preview, iterations, scale=card.PREVIEW_SCALE))
+
+    return results
+
+
+# ========== 报告 ==========
+def compare_with_baseline(results, baseline_path, threshold):
+    """与历史结果比较中位数，返回变慢超过阈值的阶段列表"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {entry["stage"]: entry for entry in json.load(f)["stages"]}
+
+    regressions = []
+    for entry in results:
+        old = baseline.get(entry["stage"])
+        if not old or not old["median_ms"]:
+            continue
+        change = entry["median_ms"] / old["median_ms"] - 1
+        entry["baseline_median_ms"] = old["median_ms"]
+        entry["change"] = round(change, 4)
+        if change > threshold:
+            regressions.append(entry)
+    return regressions
+
+
+def print_table(results):
+    print(f"{'阶段':<32}{'中位数(ms)':>12}{'p95(ms)':>12}{'RSS峰值(MB)':>14}")
+    print("-" * 70)
+    for entry in results:
+        rss = entry["rss_peak_delta_kb"]
+        rss_text = f"{rss / 1024:.1f}" if rss is not None else "-"
+        change = f"  ({entry['change']:+.1%})" if "change" in entry else ""
+        print(f"{entry['stage']:<32}{entry['median_ms']:>12.2f}{entry['p95_ms']:>12.2f}{rss_text:>14}{change}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="渲染流水线分阶段基准测试")
+    parser.add_argument("--iterations", type=int, default=5, help="每个阶段的迭代次数（默认5）")
+    parser.add_argument("--output", default=os.path.join(card.output_dir, "benchmark.json"),
+                        help="JSON 结果文件路径")
+    parser.add_argument("--quotes", default=card.quotes_path, help="真实语料基线 CSV")
+    parser.add_argument("--presets", nargs="+", default=sorted(PRESETS), choices=sorted(PRESETS),
+                        help="参与编码测试的输出预设")
+    parser.add_argument("--antialias", choices=[*ANTIALIAS_MODES, AUTO_MODE], default=card.ANTIALIAS_MODE,
+                        help="文字抗锯齿模式（对比不同模式时分别运行并用 --baseline 比较）")
+    parser.add_argument("--baseline", help="历史基准结果 JSON，用于检测性能回退")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="中位数变慢超过该比例视为回退（默认0.10）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tracemalloc.start()
+    card.configure_antialias(args.antialias)
+
+    baseline_rows = load_baseline_corpus(args.quotes)
+    corpus = build_synthetic_corpus(baseline_rows)
+    print(f"⏱️  基准测试: 每阶段 {args.iterations} 次 | 合成语料 {len(corpus)} 条 | 真实语料 {len(baseline_rows)} 条"
+          f" | 抗锯齿 {card.describe_antialias()}")
+
+    results = run_benchmarks(args.iterations, corpus, baseline_rows, args.presets)
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.threshold)
+
+    print_table(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "canvas": [card.IMG_WIDTH, card.IMG_HEIGHT],
+            "antialias": card.antialias_policy.describe(),
+        },
+        "stages": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已写入: {args.output}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} 个阶段性能回退超过 {args.threshold:.0%}: "
+              + ", ".join(entry["stage"] for entry in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,14 @@
-from main_antialiasing import *
+import os
+import textwrap
+
+from PIL import ImageDraw
+
+from gradient import create_gradient_bg
+from main_antialiasing import (BACKGROUND_BOTTOM, BACKGROUND_TOP, FONT_SIZE_MAIN, IMG_HEIGHT, IMG_WIDTH,
+                               TEXT_COLOR_MAIN, output_dir, render_text_with_supersampling)
 
 print("🔍 测试文字渲染边界")
+os.makedirs(output_dir, exist_ok=True)
 
 # 测试不同的文字内容
 test_texts = [
@@ -0,0 +1,104 @@
+"""
+可插拔的输出编码器：PNG / 调色板PNG / 无损WebP / 高质量JPEG与WebP，附带体积与速度预设
+"""
+
+import io
+import time
+
+from PIL import Image
+
+DEFAULT_DPI = 300
+
+
+class OutputEncoder:
+    """把画布编码为字节串的编码器"""
+
+    def __init__(self, name, image_format, extension, mode=None, palette=False, **options):
+        self.name = name
+        self.image_format = image_format
+        self.extension = extension
+        self.mode = mode              # 需要转换的颜色模式（JPEG 不支持透明通道）
+        self.palette = palette        # 是否先量化为 256 色调色板
+        self.options = options
+
+    def describe(self):
+        """编码器的完整参数（写入构建清单，参数变化会触发重新渲染）"""
+        return {"name": self.name, "format": self.image_format, "mode": self.mode,
+                "palette": self.palette, "options": self.options}
+
+    def encode(self, img, dpi=DEFAULT_DPI):
+        """编码图像，返回 (字节串, 编码耗时秒数)"""
+        start = time.perf_counter()
+        if self.palette:
+            img = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        elif self.mode and img.mode != self.mode:
+            img = img.convert(self.mode)
+
+        options = dict(self.options)
+        if self.image_format in ("PNG", "JPEG"):
+            options["dpi"] = (dpi, dpi)
+
+        buffer = io.BytesIO()
+        img.save(buffer, self.image_format, **options)
+        return buffer.getvalue(), time.perf_counter() - start
+
+
+def png_encoder(compress_level=0):
+    """无损PNG，compress_level 0-9（0 最快、体积最大）"""
+    return OutputEncoder("png", "PNG", ".png", optimize=False, compress_level=compress_level)
+
+
+def png_palette_encoder(compress_level=6):
+    """256色调色板PNG，纯色/渐变为主的卡片体积大幅缩小"""
+    return OutputEncoder("png-palette", "PNG", ".png", palette=True, optimize=False,
+                         compress_level=compress_level)
+
+
+def webp_lossless_encoder(effort=4):
+    """无损WebP，effort 0-6（对应 Pillow 的 method）"""
+    return OutputEncoder("webp-lossless", "WEBP", ".webp", lossless=True, quality=100, method=effort)
+
+
+def webp_encoder(quality=90, effort=4):
+    """有损WebP"""
+    return OutputEncoder("webp", "WEBP", ".webp", quality=quality, method=effort)
+
+
+def jpeg_encoder(quality=95):
+    """高质量JPEG（关闭色度抽样，保证细字边缘清晰）"""
+    return OutputEncoder("jpeg", "JPEG", ".jpg", mode="RGB", quality=quality, subsampling=0, optimize=False)
+
+
+ENCODER_FACTORIES = {
+    "png": png_encoder,
+    "png-palette": png_palette_encoder,
+    "webp-lossless": webp_lossless_encoder,
+    "webp": webp_encoder,
+    "jpeg": jpeg_encoder,
+}
+
+# 预设：raw 保持历史行为（未压缩PNG），其余按渠道权衡体积与速度
+PRESETS = {
+    "raw": ("png", {"compress_level": 0}),
+    "archive": ("png", {"compress_level": 6}),
+    "web": ("webp", {"quality": 90}),
+    "preview": ("jpeg", {"quality": 80}),
+}
+DEFAULT_PRESET = "raw"
+
+
+def get_encoder(name=None, preset=DEFAULT_PRESET, quality=None, compress_level=None):
+    """按预设或编码器名称创建编码器，quality/compress_level 可覆盖默认参数"""
+    if name is None:
+        name, options = PRESETS[preset]
+        options = dict(options)
+    else:
+        options = {}
+    if name not in ENCODER_FACTORIES:
+        raise ValueError(f"未知的编码器: {name}（可选: {', '.join(ENCODER_FACTORIES)}）")
+
+    if quality is not None and name in ("webp", "jpeg"):
+        options["quality"] = quality
+    if compress_level is not None and name in ("png", "png-palette"):
+        options["compress_level"] = compress_level
+    return ENCODER_FACTORIES[name](**options)
@@ -0,0 +1,76 @@
+"""
+进程级字体注册表：启动时一次性解析字体回退链，按 (路径, 字号) 缓存字体对象
+"""
+
+import os
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+# 自定义字体缺失时依次尝试的系统字体
+FALLBACK_FONT_PATHS = ["C:/Windows/Fonts/msyh.ttc"]
+
+# 一张卡片大约用到 8 种字号（含超采样字号），留足余量
+FONT_CACHE_SIZE = 32
+
+
+def resolve_font_path(candidates):
+    """按顺序返回第一个存在的字体文件路径，全部缺失时返回 None"""
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+class FontRegistry:
+    """带 LRU 淘汰的字体缓存，记录命中/未命中次数"""
+
+    def __init__(self, candidates, max_entries=FONT_CACHE_SIZE):
+        self.candidates = list(candidates)
+        self.font_path = resolve_font_path(self.candidates)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    @property
+    def using_fallback(self):
+        """是否没有用上首选字体"""
+        return self.font_path != (self.candidates[0] if self.candidates else None)
+
+    def get(self, size, path=None):
+        """获取指定字号的字体，未缓存时才真正打开字体文件"""
+        path = path or self.font_path
+        key = (path, size)
+        font = self._cache.get(key)
+        if font is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return font
+
+        self.misses += 1
+        try:
+            font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+        except OSError:
+            font = ImageFont.load_default()
+
+        self._cache[key] = font
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return font
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        return {
+            "font_path": self.font_path,
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
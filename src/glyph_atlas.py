@@ -0,0 +1,216 @@
+"""
+字形图集：每个字形在每个字号下只光栅化一次（超采样后缩小为最终分辨率的覆盖率蒙版），
+之后按字宽逐字拼贴成行，文字渲染变成内存拷贝；图集按 (字体哈希, 字号, 超采样倍数) 持久化到磁盘
+"""
+
+import json
+import math
+import os
+
+from PIL import Image, ImageChops, ImageDraw, PngImagePlugin
+
+from manifest import file_sha256
+
+ATLAS_FORMAT_VERSION = 2
+HASH_PREFIX_LENGTH = 16
+# LANCZOS 核半径为 3 个输出像素，字形四周留出同样宽度，缩小时边缘的振铃不会被截掉
+GLYPH_MARGIN = 3
+# 图集 PNG 的宽度（最终分辨率下的像素），字形按行高排列成若干货架
+SHEET_WIDTH = 2048
+# 常驻服务里新增多少个字形后写一次盘（批量渲染结束时总会写盘）
+ATLAS_SAVE_INTERVAL = 256
+
+
+class GlyphAtlas:
+    """某个字体、字号、超采样倍数下的字形图集
+
+    字宽和包围盒以超采样像素记录；字形按横纵两个方向的超采样相位（0..倍数-1）分别缓存，
+    字距和行基线都保持超采样精度，与 FreeType 整行渲染后缩小的结果一致。
+    """
+
+    def __init__(self, font, factor):
+        self.font = font
+        self.factor = factor
+        self._metrics = {}  # 字符 -> (字宽, x0, y0, x1, y1)
+        self._cells = {}    # (字符, 横向相位, 纵向相位) -> (蒙版, 偏移x, 偏移y)，空白字符为 None
+        self.hits = 0
+        self.misses = 0
+        self.pending = 0    # 上次写盘后新增的字形数
+
+    def metrics(self, ch):
+        value = self._metrics.get(ch)
+        if value is None:
+            value = self._metrics[ch] = (self.font.getlength(ch), *self.font.getbbox(ch))
+        return value
+
+    def bbox(self, line):
+        """整行的包围盒：直接取 FreeType 的排版结果（只排版不光栅化），居中和行高与 freetype 后端完全一致"""
+        return self.font.getbbox(line)
+
+    def cell(self, ch, phase_x, phase_y):
+        key = (ch, phase_x, phase_y)
+        if key in self._cells:
+            self.hits += 1
+            return self._cells[key]
+        self.misses += 1
+        self.pending += 1
+        cell = self._cells[key] = self._rasterize(ch, phase_x, phase_y)
+        return cell
+
+    def _rasterize(self, ch, phase_x, phase_y):
+        """把字形画在超采样相位 (phase_x, phase_y) 处，缩小为最终分辨率；单元格四边对齐到倍数"""
+        _, gx0, gy0, gx1, gy1 = self.metrics(ch)
+        if gx1 <= gx0 or gy1 <= gy0:
+            return None
+        f = self.factor
+        margin = GLYPH_MARGIN * f
+        cell_x0 = math.floor((phase_x + gx0) / f) * f - margin
+        cell_x1 = math.ceil((phase_x + gx1) / f) * f + margin
+        cell_y0 = math.floor((phase_y + gy0) / f) * f - margin
+        cell_y1 = math.ceil((phase_y + gy1) / f) * f + margin
+        mask = Image.new("L", (cell_x1 - cell_x0, cell_y1 - cell_y0), 0)
+        ImageDraw.Draw(mask).text((phase_x - cell_x0, phase_y - cell_y0), ch, font=self.font, fill=255)
+        if f > 1:
+            mask = mask.resize((mask.width // f, mask.height // f), Image.Resampling.LANCZOS)
+        return mask, cell_x0 // f, cell_y0 // f
+
+    def blit(self, mask, line, xy):
+        """把一行文字叠加到最终分辨率的蒙版上；xy 为超采样坐标下的行原点（与 ImageDraw.text 相同）
+
+        字形原点取整到超采样像素，取整方式与 Pillow 整行绘制时相同（x 的 .5 进位、y 的 .5 舍去）；
+        横纵两个方向都按超采样相位分别缓存，行基线和每个字的位置都不再对齐到最终分辨率的整像素。
+        """
+        f = self.factor
+        pen = xy[0]
+        origin_y = math.ceil(xy[1] - 0.5)
+        phase_y = origin_y % f
+        y = (origin_y - phase_y) // f
+        for ch in line:
+            origin_x = math.floor(pen + 0.5)
+            phase_x = origin_x % f
+            cell = self.cell(ch, phase_x, phase_y)
+            if cell is not None:
+                glyph, offset_x, offset_y = cell
+                _add_clipped(mask, glyph, (origin_x - phase_x) // f + offset_x, y + offset_y)
+            pen += self.metrics(ch)[0]
+
+    def __len__(self):
+        return len(self._cells)
+
+    # ---------- 持久化：单个 PNG，索引写在文本块里 ----------
+    def save(self, path):
+        """原子写入图集文件；目录不可写时静默跳过"""
+        entries = []
+        cells = sorted(((key, cell) for key, cell in self._cells.items() if cell is not None),
+                       key=lambda item: -item[1][0].height)
+        x = y = shelf_height = 0
+        for key, (glyph, offset_x, offset_y) in cells:
+            if x + glyph.width > SHEET_WIDTH:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            entries.append([*key, x, y, glyph.width, glyph.height, offset_x, offset_y])
+            x += glyph.width
+            shelf_height = max(shelf_height, glyph.height)
+        blanks = [list(key) for key, cell in self._cells.items() if cell is None]
+
+        sheet = Image.new("L", (SHEET_WIDTH, max(1, y + shelf_height)), 0)
+        for (key, (glyph, _, _)), entry in zip(cells, entries):
+            sheet.paste(glyph, (entry[3], entry[4]))
+        index = {"version": ATLAS_FORMAT_VERSION, "factor": self.factor,
+                 "metrics": self._metrics, "cells": entries, "blanks": blanks}
+        info = PngImagePlugin.PngInfo()
+        info.add_text("atlas", json.dumps(index, ensure_ascii=False))
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            sheet.save(tmp_path, "PNG", pnginfo=info, compress_level=1)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.pending = 0
+        return True
+
+    def load(self, path):
+        """载入已保存的图集（与已有条目合并），文件缺失或损坏时返回 False"""
+        try:
+            with Image.open(path) as sheet:
+                index = json.loads(sheet.text["atlas"])
+                if index.get("version") != ATLAS_FORMAT_VERSION or index.get("factor") != self.factor:
+                    return False
+                sheet = sheet.convert("L")
+        except (OSError, KeyError, ValueError):
+            return False
+        for ch, value in index["metrics"].items():
+            self._metrics.setdefault(ch, tuple(value))
+        for ch, phase_x, phase_y, x, y, w, h, offset_x, offset_y in index["cells"]:
+            self._cells.setdefault((ch, phase_x, phase_y), (sheet.crop((x, y, x + w, y + h)), offset_x, offset_y))
+        for ch, phase_x, phase_y in index["blanks"]:
+            self._cells.setdefault((ch, phase_x, phase_y), None)
+        return True
+
+
+def _add_clipped(mask, glyph, x, y):
+    """把字形覆盖率饱和相加到蒙版的 (x, y) 处，超出蒙版的部分裁掉"""
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + glyph.width, mask.width), min(y + glyph.height, mask.height)
+    if left >= right or top >= bottom:
+        return
+    box = (left, top, right, bottom)
+    if (left, top, right, bottom) != (x, y, x + glyph.width, y + glyph.height):
+        glyph = glyph.crop((left - x, top - y, right - x, bottom - y))
+    mask.paste(ImageChops.add(mask.crop(box), glyph), box)
+
+
+class GlyphAtlasStore:
+    """按 (字号, 超采样倍数) 管理图集，首次用到时从磁盘载入；构造时不做任何 I/O"""
+
+    def __init__(self, font_registry, cache_dir, enabled=True):
+        self.font_registry = font_registry
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self._atlases = {}
+        self._font_digest = None
+        self.loaded = 0
+
+    def _path(self, font_size, factor):
+        font_path = self.font_registry.font_path
+        if self._font_digest is None:
+            self._font_digest = file_sha256(font_path)[:HASH_PREFIX_LENGTH] if font_path else "default"
+        stem = os.path.splitext(os.path.basename(font_path or "default"))[0]
+        return os.path.join(self.cache_dir, f"{stem}_{self._font_digest}_{font_size}px_{factor}x.png")
+
+    def atlas(self, font_size, factor):
+        key = (self.font_registry.font_path, font_size, factor)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            atlas = self._atlases[key] = GlyphAtlas(self.font_registry.get(font_size * factor), factor)
+            if self.enabled and atlas.load(self._path(font_size, factor)):
+                self.loaded += 1
+        return atlas
+
+    def save(self, min_pending=1):
+        """把新增字形达到 min_pending 的图集写盘，返回写入的文件数"""
+        if not self.enabled:
+            return 0
+        saved = 0
+        for (_, font_size, factor), atlas in self._atlases.items():
+            if atlas.pending >= min_pending and atlas.save(self._path(font_size, factor)):
+                saved += 1
+        return saved
+
+    def clear(self):
+        """丢弃内存中的图集（不删除磁盘文件）"""
+        self._atlases.clear()
+        self.loaded = 0
+
+    def stats(self):
+        atlases = self._atlases.values()
+        return {
+            "atlases": len(self._atlases),
+            "loaded": self.loaded,
+            "glyphs": sum(len(atlas) for atlas in atlases),
+            "hits": sum(atlas.hits for atlas in atlases),
+            "misses": sum(atlas.misses for atlas in atlases),
+        }
@@ -0,0 +1,77 @@
+"""
+渐变背景引擎：渐变列逐通道按行计算（取整方式与逐行 draw.line 完全一致），各通道由 C 层合并，
+再拉伸到整幅画布，按参数缓存结果；文字区域背后的柔和面板同样按 (高度, 配色) 缓存渐变列，宽度只做拉伸
+"""
+
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+# 同一批次通常只有一两种背景配色，保留少量模板即可
+GRADIENT_CACHE_SIZE = 8
+# 面板高度由行数和字号档位决定，取值有限；每列只有 高度×4 字节
+PANEL_CACHE_SIZE = 128
+
+
+def _column(height, top_color, bottom_color, mode, easing=None):
+    """1 像素宽的渐变列：第 y 行取 ratio = y / height，每个通道一次生成整列字节，再由 merge 拼成多通道"""
+    ratios = [y / height for y in range(height)]
+    if easing:
+        ratios = [easing(ratio) for ratio in ratios]
+    channels = []
+    for top, bottom in zip(top_color, bottom_color):
+        data = bytes(int(top * (1 - ratio) + bottom * ratio) for ratio in ratios)
+        channels.append(Image.frombytes("L", (1, height), data))
+    return Image.merge(mode, channels)
+
+
+def _smoothstep(ratio):
+    return ratio * ratio * (3.0 - 2.0 * ratio)
+
+
+def _gradient_column(height, top_color, bottom_color):
+    """1 像素宽的 RGB 线性渐变列"""
+    return _column(height, top_color, bottom_color, "RGB")
+
+
+@lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def _gradient_template(size, top_color, bottom_color, mode="RGBA"):
+    """生成并缓存渐变模板（RGBA 或 RGB），调用方不得直接修改返回值"""
+    width, height = size
+    column = _gradient_column(height, top_color, bottom_color)
+    # 最近邻横向拉伸：每一行只有一个颜色，拉伸后逐像素与原实现相同
+    return column.resize((width, height), Image.Resampling.NEAREST).convert(mode)
+
+
+def create_gradient_bg(width, height, top_color, bottom_color, mode="RGBA"):
+    """创建高质量渐变背景（返回缓存模板的副本，可放心绘制）"""
+    return _gradient_template((width, height), tuple(top_color), tuple(bottom_color), mode).copy()
+
+
+def clear_gradient_cache():
+    """清空渐变模板缓存"""
+    _gradient_template.cache_clear()
+
+
+def gradient_cache_info():
+    """返回渐变缓存命中情况"""
+    return _gradient_template.cache_info()
+
+
+@lru_cache(maxsize=PANEL_CACHE_SIZE)
+def _panel_column(height, top_color, bottom_color):
+    """柔和面板的 1 像素宽 RGBA 渐变列（smoothstep 插值）"""
+    return _column(height, top_color, bottom_color, "RGBA", easing=_smoothstep)
+
+
+def create_soft_panel(width, height, top_color, bottom_color, border_color):
+    """创建半透明柔和渐变面板（平滑插值 + 1px 细边框），每行颜色相同，由缓存的渐变列横向拉伸而来"""
+    column = _panel_column(height, tuple(top_color), tuple(bottom_color))
+    panel = column.resize((width, height), Image.Resampling.NEAREST)
+    ImageDraw.Draw(panel).rectangle([0, 0, width - 1, height - 1], outline=border_color, width=1)
+    return panel
+
+
+def panel_cache_info():
+    """返回面板渐变列缓存命中情况"""
+    return _panel_column.cache_info()
@@ -0,0 +1,104 @@
+"""
+按像素宽度断行：用实测字宽（按字体和字号缓存，整批复用）对照实际可用宽度断行，
+遵守中文避头尾规则，CSV 中的空行视为段落分隔
+"""
+
+import re
+
+# 不能出现在行首的标点（行首禁则）
+NO_LINE_START = set("，。、；：？！）」』】》〉〕］｝”’…—·～%‰℃,.;:?!)]}>")
+# 不能出现在行尾的标点（行尾禁则）
+NO_LINE_END = set("（「『【《〈〔［｛“‘([{<")
+
+# 断行单位：连续的拉丁字母/数字为一个单词；连续的破折号、省略号不拆开；空白单独成单位；其余每个字符一个单位
+_UNIT_PATTERN = re.compile(r"[A-Za-z0-9'’\-]+|—+|…+|\s+|.", re.S)
+_PARAGRAPH_PATTERN = re.compile(r"\s*\n\s*")
+
+
+def split_units(text):
+    return _UNIT_PATTERN.findall(text)
+
+
+class AdvanceTable:
+    """某个字体、字号下的字宽表（单字测量一次后缓存）"""
+
+    def __init__(self, font):
+        self.font = font
+        self._advances = {}
+
+    def advance(self, ch):
+        width = self._advances.get(ch)
+        if width is None:
+            width = self._advances[ch] = self.font.getlength(ch)
+        return width
+
+    def width(self, text):
+        return sum(self.advance(ch) for ch in text)
+
+    def __len__(self):
+        return len(self._advances)
+
+
+class LineBreaker:
+    """按像素宽度断行，字宽表按 (字体路径, 字号) 缓存，跨语录复用"""
+
+    def __init__(self, font_registry):
+        self.font_registry = font_registry
+        self._tables = {}
+
+    def table(self, font_size):
+        key = (self.font_registry.font_path, font_size)
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = AdvanceTable(self.font_registry.get(font_size))
+        return table
+
+    def break_lines(self, text, font_size, max_width):
+        """返回断好的行列表；每个段落（原文中的换行/空行）从新行开始"""
+        table = self.table(font_size)
+        lines = []
+        for paragraph in _PARAGRAPH_PATTERN.split(text.strip()):
+            if paragraph:
+                lines.extend(self._break_paragraph(paragraph, table, max_width))
+        return lines
+
+    def fill(self, text, font_size, max_width):
+        """与 textwrap.fill 相同的用法：返回以换行符连接的文本"""
+        return "\n".join(self.break_lines(text, font_size, max_width))
+
+    def _break_paragraph(self, paragraph, table, max_width):
+        lines = []
+        line, line_width = [], 0.0
+        for unit in split_units(paragraph):
+            unit_width = table.width(unit)
+            if not line and unit.isspace():
+                continue  # 行首空白丢弃
+            if line_width + unit_width <= max_width or not line:
+                if unit_width > max_width and not line and not unit.isspace() and len(unit) > 1:
+                    # 单个单位比整行还宽（超长英文单词），只能逐字拆开
+                    for ch in unit:
+                        if line and line_width + table.advance(ch) > max_width:
+                            lines.append("".join(line))
+                            line, line_width = [], 0.0
+                        line.append(ch)
+                        line_width += table.advance(ch)
+                    continue
+                line.append(unit)
+                line_width += unit_width
+                continue
+
+            # 放不下：向前寻找满足避头尾规则的断点，把断点之后的单位连同当前单位移到下一行
+            pending = line + [unit]
+            cut = len(line)
+            while cut > 0 and (pending[cut][0] in NO_LINE_START or pending[cut - 1][-1] in NO_LINE_END):
+                cut -= 1
+            if cut == 0:
+                cut = len(line)  # 整行都无法满足规则时退回按宽度硬断
+            lines.append("".join(line[:cut]).rstrip())
+            line = pending[cut:]
+            while line and line[0].isspace():
+                line.pop(0)
+            line_width = sum(table.width(u) for u in line)
+        if line:
+            lines.append("".join(line).rstrip())
+        return [text for text in lines if text]
@@ -1,7 +1,10 @@
-from PIL import Image, ImageDraw, ImageFont
-import pandas as pd
+from PIL import Image, ImageDraw
 import textwrap, os
 
+from fonts import FALLBACK_FONT_PATHS, FontRegistry
+from gradient import create_gradient_bg
+from quotes_io import count_quotes, iter_quotes
+
 # ========== 路径配置 ==========
 # 获取项目根目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,53 +34,28 @@ DPI = 300  # 高质量DPI
 FONT_SIZE_MAIN = 160      # 主字体 (原80*2)
 FONT_SIZE_REFLECT = 110   # 副字体 (原55*2)
 
-try:
-    font_main = ImageFont.truetype(font_path, FONT_SIZE_MAIN)
-    font_reflect = ImageFont.truetype(font_path, FONT_SIZE_REFLECT)
+# 启动时一次性解析回退链，之后所有字号都从注册表取
+font_registry = FontRegistry([font_path, *FALLBACK_FONT_PATHS])
+if not font_registry.using_fallback:
     print("✅ 已载入自定义字体 (4K高分辨率)")
-except OSError:
+else:
     print(f"⚠️ 字体文件未找到: {font_path}")
     print("💡 使用系统默认字体，建议下载字体文件以获得更好效果")
-    try:
-        # Windows 系统字体
-        font_main = ImageFont.truetype("C:/Windows/Fonts/msyh.ttc", FONT_SIZE_MAIN)
-        font_reflect = ImageFont.truetype("C:/Windows/Fonts/msyh.ttc", FONT_SIZE_REFLECT)
-    except OSError:
-        font_main = ImageFont.load_default()
-        font_reflect = ImageFont.load_default()
+    if font_registry.font_path is None:
         print("⚠️ 使用默认字体，显示效果可能不佳")
-
-# ========== 渐变背景函数 ==========
-def create_gradient_bg(width, height, top_color, bottom_color):
-    """创建高质量渐变背景"""
-    # 创建高分辨率背景
-    bg = Image.new("RGB", (width, height), top_color)
-    draw = ImageDraw.Draw(bg)
-    
-    top_r, top_g, top_b = top_color
-    bot_r, bot_g, bot_b = bottom_color
-    
-    # 使用更高效的渐变算法
-    for y in range(height):
-        ratio = y / height
-        # 使用浮点数计算以获得更平滑的渐变
-        r = int(top_r * (1 - ratio) + bot_r * ratio)
-        g = int(top_g * (1 - ratio) + bot_g * ratio)
-        b = int(top_b * (1 - ratio) + bot_b * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    
-    return bg.convert("RGBA")
+font_main = font_registry.get(FONT_SIZE_MAIN)
+font_reflect = font_registry.get(FONT_SIZE_REFLECT)
 
 # ========== 载入语录 ==========
-df = pd.read_csv(quotes_path, encoding="utf-8")
+total = count_quotes(quotes_path)
 logo = Image.open(logo_path).convert("RGBA")
 
 print(f"🎨 开始生成4K高清图片 ({IMG_WIDTH}x{IMG_HEIGHT})")
-print(f"📝 共有 {len(df)} 条语录待处理")
+print(f"📝 共有 {total} 条语录待处理")
 print("=" * 50)
 
-for idx, (_, row) in enumerate(df.iterrows(), 1):
-    print(f"🔄 处理第 {idx}/{len(df)} 条语录: ID {row['id']}")
+for idx, row in enumerate(iter_quotes(quotes_path), 1):
+    print(f"🔄 处理第 {idx}/{total} 条语录: ID {row['id']}")
     # 创建渐变背景
     bg = create_gradient_bg(IMG_WIDTH, IMG_HEIGHT, BACKGROUND_TOP, BACKGROUND_BOTTOM)
     draw = ImageDraw.Draw(bg)
@@ -112,8 +90,7 @@ for idx, (_, row) in enumerate(df.iterrows(), 1):
     temp_draw = ImageDraw.Draw(temp_img)
     
     # 在超采样画布上绘制文字
-    temp_font = ImageFont.truetype(font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", 
-                                  int(FONT_SIZE_MAIN * scale_factor))
+    temp_font = font_registry.get(int(FONT_SIZE_MAIN * scale_factor))
     temp_draw.text((0, 0), text, font=temp_font, fill=TEXT_COLOR_MAIN)
     
     # 缩放回原尺寸并应用抗锯齿
@@ -135,8 +112,7 @@ for idx, (_, row) in enumerate(df.iterrows(), 1):
     temp_draw_r = ImageDraw.Draw(temp_img_r)
     
     # 在超采样画布上绘制反思文字
-    temp_font_r = ImageFont.truetype(font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", 
-                                    int(FONT_SIZE_REFLECT * scale_factor))
+    temp_font_r = font_registry.get(int(FONT_SIZE_REFLECT * scale_factor))
     temp_draw_r.text((0, 0), reflection, font=temp_font_r, fill=TEXT_COLOR_REFLECT)
     
     # 缩放回原尺寸并应用抗锯齿
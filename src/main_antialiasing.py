@@ -1,6 +1,33 @@
-from PIL import Image, ImageDraw, ImageFont
-import pandas as pd
-import textwrap, os
+from PIL import Image, ImageDraw
+import os
+import argparse
+import collections
+import functools
+import itertools
+import json
+import multiprocessing
+import multiprocessing.util
+import signal
+import sys
+import time
+import tracemalloc
+
+from asset_cache import AssetCache
+from antialias import (AUTO_MODE, ANTIALIAS_MODES, DEFAULT_ANTIALIAS_MODE,
+                       DEFAULT_QUALITY_THRESHOLD, AntialiasPolicy)
+from encoders import DEFAULT_PRESET, ENCODER_FACTORIES, PRESETS, get_encoder
+from fonts import FALLBACK_FONT_PATHS, FontRegistry
+from glyph_atlas import ATLAS_SAVE_INTERVAL, GlyphAtlasStore
+from gradient import clear_gradient_cache, create_gradient_bg, create_soft_panel
+from linebreak import LineBreaker
+from manifest import REASON_RESUMED, BuildManifest, JobJournal, file_sha256
+from profiling import NULL_PROFILER, QuoteProfiler, TraceLog, read_status_kb, reset_peak_rss
+from quotes_io import count_quotes, iter_quotes
+from shadows import ShadowCache, alpha_of
+from sinks import ARCHIVE_FORMATS, PARTIAL_SUFFIX, ArchiveSink, BufferSink, DirectorySink, archive_format
+from text_masks import TextMaskCache, colorize_mask
+from verify import PASSING_STATUSES, STATUS_DRIFT, ReferenceSet
+from themes import ThemeClassifier
 
 # ========== 路径配置 ==========
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,8 +38,14 @@ theme_icon_path = os.path.join(project_root, "resources", "theme.png")
 home_icon_path = os.path.join(project_root, "resources", "home.png")
 font_path = os.path.join(project_root, "resources", "fonts", "SmileySans-Oblique.ttf")
 quotes_path = os.path.join(project_root, "resources", "quotes.csv")
+theme_keywords_path = os.path.join(project_root, "resources", "theme_keywords.csv")
 output_dir = os.path.join(project_root, "output")
-os.makedirs(output_dir, exist_ok=True)
+reference_dir = os.path.join(project_root, "reference")
+asset_cache_dir = os.path.join(project_root, ".cache", "assets")
+glyph_cache_dir = os.path.join(project_root, ".cache", "glyphs")
+
+# 预缩放图标的磁盘缓存（按源文件哈希和目标尺寸），首次使用时才读写
+asset_cache = AssetCache(asset_cache_dir)
 
 # ========== 画布参数 ==========
 IMG_WIDTH, IMG_HEIGHT = 2160, 3840  # 4K竖屏分辨率
@@ -22,10 +55,82 @@ TEXT_COLOR_MAIN = (60, 60, 60)
 TEXT_COLOR_REFLECT = (120, 120, 120)
 DPI = 300
 
+# 画布模式：RGBA 为历史行为；RGB 只保留三通道整帧，半透明元素按包围盒混合进画布，单张内存约少 1/4
+CANVAS_MODES = ("RGBA", "RGB")
+CANVAS_MODE = "RGBA"
+
+# ========== 排版缩放 ==========
+# 所有版式坐标都以 4K 画布为基准书写，渲染时按比例换算；预览按 1/4 线性尺寸（像素约为 1/16）
+LAYOUT_SCALE = 1.0
+PREVIEW_SCALE = 0.25
+
+def scaled(value, scale):
+    """把 4K 基准下的像素值换算到指定缩放比例（非零值至少保留 1px，保持符号）"""
+    if scale == 1 or not value:
+        return value
+    magnitude = max(1, round(abs(value) * scale))
+    return magnitude if value > 0 else -magnitude
+
+def canvas_size(scale=LAYOUT_SCALE):
+    """指定缩放比例下的画布尺寸"""
+    return scaled(IMG_WIDTH, scale), scaled(IMG_HEIGHT, scale)
+
+# ========== 派生尺寸 ==========
+# 同一次渲染的内存画布逐级缩小输出多个尺寸（社交平台、CMS 缩略图等），文件名标注像素尺寸
+OUTPUT_SIZE_PRESETS = {"social": (1080, 1920), "thumb": (270, 480)}
+
+def parse_output_size(spec):
+    """解析派生尺寸：预设名、WxH 或只给宽度 W（高度按画布比例计算）"""
+    spec = spec.strip().lower()
+    if spec in OUTPUT_SIZE_PRESETS:
+        return OUTPUT_SIZE_PRESETS[spec]
+    try:
+        if "x" in spec:
+            width, height = (int(part) for part in spec.split("x", 1))
+        else:
+            width = int(spec)
+            height = round(width * IMG_HEIGHT / IMG_WIDTH)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"无法解析的输出尺寸: {spec}（可选: {', '.join(OUTPUT_SIZE_PRESETS)}、WxH 或宽度）") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"输出尺寸必须为正数: {spec}")
+    return width, height
+
+def parse_output_sizes(value):
+    """逗号分隔的派生尺寸列表，去重后从大到小排列"""
+    sizes = {parse_output_size(spec) for spec in value.split(",") if spec.strip()}
+    return sorted(sizes, key=lambda size: size[0] * size[1], reverse=True)
+
+def derive_sizes(frame, sizes):
+    """级联缩小：每个尺寸都从上一级（更大的）结果缩小而来，逐个产出 (尺寸, 图像)
+
+    sizes 须从大到小排列且不大于 frame；相邻两级之间用 LANCZOS 缩小。
+    """
+    source = frame
+    for size in sizes:
+        if size == source.size:
+            image = source
+        else:
+            image = source.resize(size, Image.Resampling.LANCZOS)
+        yield size, image
+        source = image
+
 # ========== 专业级抗锯齿设置 ==========
-SUPER_SAMPLE_FACTOR = 4  # 4倍超采样，完全消除锯齿
+ANTIALIAS_MODE = DEFAULT_ANTIALIAS_MODE  # 抗锯齿模式：native / 2x / 4x（默认，完全消除锯齿）/ auto
+AA_QUALITY_THRESHOLD = DEFAULT_QUALITY_THRESHOLD  # auto 模式允许的相对 4x 参考的覆盖率误差（%）
+# 文字光栅化后端：freetype 每段文字整体超采样渲染；atlas 每个字形只光栅化一次，之后逐字拼贴（图集持久化到磁盘）
+TEXT_BACKENDS = ("freetype", "atlas")
+TEXT_BACKEND = "freetype"
 FONT_SIZE_MAIN = 160     # 默认字体大小（短文本）
 FONT_SIZE_REFLECT = 110  # 副文字字体大小
+# 按像素断行的可用行宽（4K 基准）：主体文字为画布宽减去两侧各 200px 的柔和背景内边距
+MAIN_TEXT_WIDTH = 1760
+REFLECTION_TEXT_WIDTH = 1600
+# 主体文字块的估算高度上限（4K 基准）：超出时逐档缩小字号，保证下方反思和图标留在画布内
+MAIN_TEXT_MAX_HEIGHT = 1000
+FONT_SIZE_MAIN_MIN = 80
+FONT_SIZE_STEP = 16
 
 # ========== 动态字体大小调整 ==========
 def get_optimal_font_size(text_length, base_font_size=160):
@@ -42,93 +147,90 @@ def get_optimal_font_size(text_length, base_font_size=160):
     else:                        # 超长文本
         return int(base_font_size * 0.5)   # 80px
 
+_theme_classifier = None
+
 def extract_theme_keyword(content):
-    """从内容中提取主题关键词"""
-    # 常见的心理学主题词映射
-    theme_keywords = {
-        '焦虑与安全感': ['焦虑', '紧张', '不安', '担心', '恐惧', '害怕', '威胁', '危险', '安全'],
-        '情绪与感受': ['情绪', '感受', '心情', '愤怒', '难过', '开心', '悲伤', '快乐', '痛苦'],
-        '自我认知': ['自己', '自我', '内心', '性格', '个性', '认识', '了解', '发现'],
-        '人际关系': ['关系', '朋友', '家人', '同事', '社交', '交往', '沟通', '理解'],
-        '压力与释放': ['压力', '疲惫', '累', '负担', '重压', '紧绷', '疲劳', '休息'],
-        '成长与改变': ['成长', '改变', '进步', '学习', '发展', '提升', '突破', '蜕变'],
-        '内心平静': ['平静', '安静', '宁静', '放松', '冥想', '呼吸', '缓慢', '安心'],
-        '自信与勇气': ['自信', '勇气', '坚强', '力量', '能力', '勇敢', '坚持', '相信'],
-        '生活智慧': ['智慧', '道理', '明白', '领悟', '思考', '理解', '感悟', '启发'],
-        '心理疗愈': ['疗愈', '治疗', '康复', '恢复', '健康', '修复', '愈合'],
-        '敏感与天赋': ['敏感', '天赋', '感官', '细腻', '敏锐', '天生', '特质'],
-        '控制与接纳': ['控制', '掌控', '接纳', '允许', '放手', '顺其自然'],
-        '时间与节奏': ['时间', '节奏', '时区', '慢下来', '当下', '现在', '此刻'],
-        '希望与连接': ['希望', '连接', '在乎', '爱', '关心', '联系', '纽带']
-    }
-    
-    # 检查内容中是否包含特定关键词
-    for theme, keywords in theme_keywords.items():
-        for keyword in keywords:
-            if keyword in content:
-                return theme
-    
-    # 如果没有匹配到特定主题，返回默认主题
-    if '你' in content and ('自己' in content or '内心' in content):
-        return '自我对话'
-    elif '生活' in content or '人生' in content:
-        return '生活感悟'
-    elif '身体' in content or '呼吸' in content:
-        return '身心合一'
-    else:
-        return '心理洞察'
+    """从内容中提取主题关键词（关键词表见 resources/theme_keywords.csv，首次调用时构建匹配自动机）"""
+    global _theme_classifier
+    if _theme_classifier is None:
+        _theme_classifier = ThemeClassifier.from_file(theme_keywords_path)
+    return _theme_classifier.classify(content).theme
 
 # ========== 字体 ==========
-try:
-    font_main = ImageFont.truetype(font_path, FONT_SIZE_MAIN)
-    font_reflect = ImageFont.truetype(font_path, FONT_SIZE_REFLECT)
-    print("✅ 已载入自定义字体 (专业级抗锯齿)")
-except OSError:
-    print(f"⚠️ 字体文件未找到: {font_path}")
-    try:
-        font_main = ImageFont.truetype("C:/Windows/Fonts/msyh.ttc", FONT_SIZE_MAIN)
-        font_reflect = ImageFont.truetype("C:/Windows/Fonts/msyh.ttc", FONT_SIZE_REFLECT)
-    except OSError:
-        font_main = ImageFont.load_default()
-        font_reflect = ImageFont.load_default()
-
-def create_gradient_bg(width, height, top_color, bottom_color):
-    """创建高质量渐变背景"""
-    bg = Image.new("RGB", (width, height), top_color)
-    draw = ImageDraw.Draw(bg)
-    
-    top_r, top_g, top_b = top_color
-    bot_r, bot_g, bot_b = bottom_color
-    
-    for y in range(height):
-        ratio = y / height
-        r = int(top_r * (1 - ratio) + bot_r * ratio)
-        g = int(top_g * (1 - ratio) + bot_g * ratio)
-        b = int(top_b * (1 - ratio) + bot_b * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    
-    return bg.convert("RGBA")
-
-def render_text_with_supersampling(text, font_size, text_color, line_spacing=1.4):
-    """使用超高倍采样渲染无锯齿文字，支持行距调整"""
+# 导入时只解析回退链，字体文件在第一次取用某个字号时才打开
+font_registry = FontRegistry([font_path, *FALLBACK_FONT_PATHS])
+text_mask_cache = TextMaskCache()
+# 按实测字宽断行，字宽表按 (字体, 字号) 在整批语录间复用
+line_breaker = LineBreaker(font_registry)
+antialias_policy = AntialiasPolicy(font_registry, ANTIALIAS_MODE, AA_QUALITY_THRESHOLD)
+text_backend = TEXT_BACKEND
+glyph_atlases = GlyphAtlasStore(font_registry, glyph_cache_dir)
+# 投影贴图（按素材形状模糊一次后复用）
+shadow_cache = ShadowCache()
+
+def configure_antialias(mode, threshold=AA_QUALITY_THRESHOLD):
+    """切换抗锯齿模式（需在渲染前调用；设置未变时保留 auto 模式已校准的结果）"""
+    global antialias_policy
+    if (mode, threshold) != (antialias_policy.mode, antialias_policy.threshold):
+        antialias_policy = AntialiasPolicy(font_registry, mode, threshold)
+    return antialias_policy
+
+def configure_text_backend(backend):
+    """切换文字光栅化后端（需在渲染前调用）"""
+    global text_backend
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"未知的文字渲染后端: {backend}（可选: {', '.join(TEXT_BACKENDS)}）")
+    text_backend = backend
+
+def describe_antialias():
+    """当前抗锯齿设置的可读描述"""
+    if antialias_policy.mode != AUTO_MODE:
+        return f"{antialias_policy.mode} (超采样 {antialias_policy.factor_for(FONT_SIZE_MAIN)}x)"
+    return f"auto (误差阈值 {antialias_policy.threshold}%)"
+
+
+def fit_main_text(content_text, font_size, line_spacing, scale=LAYOUT_SCALE):
+    """按像素宽度断行；文字块超过高度上限时逐档缩小字号重新断行（只查字宽表，不光栅化）
+
+    返回 (4K 基准字号, 断好的文本)
+    """
+    line_width = scaled(MAIN_TEXT_WIDTH, scale)
+    while True:
+        lines = line_breaker.break_lines(content_text, scaled(font_size, scale), line_width)
+        height = font_size * (1 + (len(lines) - 1) * line_spacing)
+        if height <= MAIN_TEXT_MAX_HEIGHT or font_size <= FONT_SIZE_MAIN_MIN:
+            return font_size, "\n".join(lines)
+        font_size = max(FONT_SIZE_MAIN_MIN, font_size - FONT_SIZE_STEP)
+
+
+def render_text_mask(text, font_size, line_spacing=1.4, scale=LAYOUT_SCALE):
+    """使用超高倍采样渲染文字覆盖率蒙版（L模式），按文本/字体/字号/行距/超采样倍数/留白缓存
+
+    font_size 为实际像素字号；scale 只用于换算蒙版四周的留白。
+    atlas 后端的排版与 freetype 相同，只是字形取自图集、直接拼贴在最终分辨率上（字形位置保留超采样相位）。
+    """
+    factor = antialias_policy.factor_for(font_size)
+    padding = (scaled(10, scale), scaled(15, scale))
+    cache_key = (text, font_registry.font_path, font_size, line_spacing, factor, padding, text_backend)
+    cached_mask = text_mask_cache.get(cache_key)
+    if cached_mask is not None:
+        return cached_mask
+
     # 创建超高分辨率字体
-    super_font_size = font_size * SUPER_SAMPLE_FACTOR
-    try:
-        super_font = ImageFont.truetype(font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", super_font_size)
-    except:
-        super_font = ImageFont.load_default()
+    super_font_size = font_size * factor
+    super_font = font_registry.get(super_font_size)
+    atlas = glyph_atlases.atlas(font_size, factor) if text_backend == "atlas" else None
     
     # 分割文本为多行
     lines = text.split('\n')
     
-    # 计算每行的尺寸
-    temp_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    # 计算每行的尺寸（直接取字体包围盒，与 ImageDraw.textbbox 结果相同，无需临时画布）
     line_heights = []
     line_widths = []
     max_width = 0
     
     for line in lines:
-        bbox = temp_draw.textbbox((0, 0), line, font=super_font)
+        bbox = atlas.bbox(line) if atlas is not None else super_font.getbbox(line)
         line_w = bbox[2] - bbox[0]
         line_h = bbox[3] - bbox[1]
         line_widths.append(line_w)
@@ -142,14 +244,21 @@ def render_text_with_supersampling(text, font_size, text_color, line_spacing=1.4
     else:
         total_height = line_heights[0] if line_heights else super_font_size
     
-    # 增加边距
-    padding_x = 40
-    padding_y = 60
+    # 增加边距（按倍数缩放，缩小后为 4K 基准下的 10px / 15px）
+    padding_x = padding[0] * factor
+    padding_y = padding[1] * factor
     
     canvas_w = int(max_width + padding_x * 2)
     canvas_h = int(total_height + padding_y * 2)
-    super_img = Image.new('RGBA', (canvas_w, canvas_h), (0, 0, 0, 0))
-    super_draw = ImageDraw.Draw(super_img)
+    # 画布取倍数的整数倍：缩小时正好 factor 个像素合成一个，蒙版不会被拉伸零点几个像素，图集后端也按同一网格拼贴
+    canvas_w -= canvas_w % factor
+    canvas_h -= canvas_h % factor
+    if atlas is not None:
+        # 图集后端直接在最终分辨率上拼贴
+        super_img = Image.new('L', (canvas_w // factor, canvas_h // factor), 0)
+    else:
+        super_img = Image.new('L', (canvas_w, canvas_h), 0)
+        super_draw = ImageDraw.Draw(super_img)
     
     # 绘制每行文字
     current_y = padding_y
@@ -157,21 +266,31 @@ def render_text_with_supersampling(text, font_size, text_color, line_spacing=1.4
     
     for i, line in enumerate(lines):
         text_x = padding_x + (max_width - line_widths[i]) // 2  # 居中对齐
-        super_draw.text((text_x, current_y), line, font=super_font, fill=text_color)
+        if atlas is not None:
+            atlas.blit(super_img, line, (text_x, current_y))
+        else:
+            super_draw.text((text_x, current_y), line, font=super_font, fill=255)
         
         if i < len(lines) - 1:  # 不是最后一行
             current_y += base_line_height * line_spacing
     
-    # 缩放回原尺寸
-    final_w = canvas_w // SUPER_SAMPLE_FACTOR
-    final_h = canvas_h // SUPER_SAMPLE_FACTOR
-    
-    final_img = super_img.resize((final_w, final_h), Image.Resampling.LANCZOS)
-    
-    return final_img, final_w, final_h
+    # 缩放回原尺寸（native 模式直接使用 FreeType 的抗锯齿结果）
+    if factor > 1 and atlas is None:
+        final_mask = super_img.resize((canvas_w // factor, canvas_h // factor), Image.Resampling.LANCZOS)
+    else:
+        final_mask = super_img
+    text_mask_cache.put(cache_key, final_mask)
 
-def draw_decorative_divider(draw, x, y, width, style="elegant"):
+    return final_mask
+
+def render_text_with_supersampling(text, font_size, text_color, line_spacing=1.4, scale=LAYOUT_SCALE):
+    """使用超高倍采样渲染无锯齿文字，支持行距调整（蒙版复用缓存，颜色在此处才上色）"""
+    final_img = colorize_mask(render_text_mask(text, font_size, line_spacing, scale), text_color)
+    return final_img, final_img.width, final_img.height
+
+def draw_decorative_divider(draw, x, y, width, style="elegant", scale=LAYOUT_SCALE):
     """绘制装饰性分隔栏"""
+    px = functools.partial(scaled, scale=scale)
     center_x = x + width // 2
     
     if style == "elegant":
@@ -180,25 +299,25 @@ def draw_decorative_divider(draw, x, y, width, style="elegant"):
         accent_color = (100, 100, 100, 200)
         
         # 主线条
-        draw.line([(x + 100, y), (x + width - 100, y)], fill=line_color, width=2)
+        draw.line([(x + px(100), y), (x + width - px(100), y)], fill=line_color, width=px(2))
         
         # 中心装饰
-        draw.ellipse([center_x - 15, y - 15, center_x + 15, y + 15], fill=accent_color)
-        draw.ellipse([center_x - 8, y - 8, center_x + 8, y + 8], fill=(200, 200, 200, 150))
+        draw.ellipse([center_x - px(15), y - px(15), center_x + px(15), y + px(15)], fill=accent_color)
+        draw.ellipse([center_x - px(8), y - px(8), center_x + px(8), y + px(8)], fill=(200, 200, 200, 150))
         
         # 两侧小装饰
-        for offset in [-120, 120]:
-            draw.ellipse([center_x + offset - 5, y - 5, center_x + offset + 5, y + 5], fill=accent_color)
+        for offset in [px(-120), px(120)]:
+            draw.ellipse([center_x + offset - px(5), y - px(5), center_x + offset + px(5), y + px(5)], fill=accent_color)
     
     elif style == "geometric":
         # 几何图形设计
         line_color = (120, 120, 120, 160)
         
         # 主线条
-        draw.line([(x + 80, y), (x + width - 80, y)], fill=line_color, width=3)
+        draw.line([(x + px(80), y), (x + width - px(80), y)], fill=line_color, width=px(3))
         
         # 菱形装饰
-        diamond_size = 20
+        diamond_size = px(20)
         points = [
             (center_x, y - diamond_size),
             (center_x + diamond_size, y),
@@ -208,44 +327,53 @@ def draw_decorative_divider(draw, x, y, width, style="elegant"):
         draw.polygon(points, fill=(140, 140, 140, 180))
         
         # 小三角形
-        for offset in [-100, 100]:
+        for offset in [px(-100), px(100)]:
             tri_points = [
-                (center_x + offset, y - 8),
-                (center_x + offset - 8, y + 8),
-                (center_x + offset + 8, y + 8)
+                (center_x + offset, y - px(8)),
+                (center_x + offset - px(8), y + px(8)),
+                (center_x + offset + px(8), y + px(8))
             ]
             draw.polygon(tri_points, fill=line_color)
 
-def add_corner_decorations(draw, width, height):
+def add_corner_decorations(draw, width, height, scale=LAYOUT_SCALE):
     """添加角落装饰"""
     corner_color = (160, 160, 160, 100)
+    near, far = scaled(50, scale), scaled(150, scale)
     
     # 左上角装饰
-    points = [(50, 50), (150, 50), (50, 150)]
+    points = [(near, near), (far, near), (near, far)]
     draw.polygon(points, fill=corner_color)
     
     # 右下角装饰
-    points = [(width - 50, height - 50), (width - 150, height - 50), (width - 50, height - 150)]
+    points = [(width - near, height - near), (width - far, height - near), (width - near, height - far)]
     draw.polygon(points, fill=corner_color)
 
 def load_icon(icon_path, size):
-    """加载图标文件，支持PNG格式"""
+    """加载图标文件，支持PNG格式（经预缩放缓存，源文件变化时自动重新缩放）"""
     try:
-        icon = Image.open(icon_path).convert("RGBA")
-        return icon.resize(size, Image.Resampling.LANCZOS)
+        return asset_cache.get(icon_path, size)
     except Exception as e:
         print(f"❌ 图标加载失败: {icon_path} - {e}")
         # 返回一个默认的空白图标
         return Image.new('RGBA', size, (100, 100, 100, 100))
 
-def draw_subtle_pattern(bg, width, height):
+def canvas_draw(bg):
+    """画布的绘制对象：RGB 画布上的半透明颜色与底色混合；RGBA 画布保持历史的直接写入行为"""
+    return ImageDraw.Draw(bg, "RGBA") if bg.mode == "RGB" else ImageDraw.Draw(bg)
+
+def draw_subtle_pattern(bg, width, height, scale=LAYOUT_SCALE):
     """添加微妙的背景图案"""
-    pattern_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    pattern_draw = ImageDraw.Draw(pattern_img)
+    if bg.mode == "RGB":
+        # 直接在画布上混合绘制，不再分配整帧的 RGBA 图案层和合成结果
+        pattern_img = None
+        pattern_draw = canvas_draw(bg)
+    else:
+        pattern_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        pattern_draw = ImageDraw.Draw(pattern_img)
     
     # 绘制微妙的网格图案
     grid_color = (255, 255, 255, 15)  # 非常淡的白色
-    grid_size = 100
+    grid_size = scaled(100, scale)
     
     # 垂直线
     for x in range(0, width, grid_size):
@@ -256,210 +384,213 @@ def draw_subtle_pattern(bg, width, height):
         pattern_draw.line([(0, y), (width, y)], fill=grid_color, width=1)
     
     # 将图案叠加到背景
-    bg = Image.alpha_composite(bg, pattern_img)
+    if pattern_img is not None:
+        bg = Image.alpha_composite(bg, pattern_img)
     return bg
 
-# ========== 载入语录和资源 ==========
-df = pd.read_csv(quotes_path, encoding="utf-8")
-logo = Image.open(logo_path).convert("RGBA")
-
-# 预设图标大小
-theme_icon_size = (500, 500)  # 缩小到原来一半大小（原480px的一半）
-home_icon_size = (500, 500)   # 保持4倍放大
-
-# 载入图标
-theme_icon = load_icon(theme_icon_path, theme_icon_size)
-home_icon = load_icon(home_icon_path, home_icon_size)
-
-print(f"🎨 开始生成专业级抗锯齿4K图片 ({IMG_WIDTH}x{IMG_HEIGHT})")
-print(f"🔧 超采样倍数: {SUPER_SAMPLE_FACTOR}x (完全消除锯齿)")
-print(f"📝 共有 {len(df)} 条语录待处理")
-print("=" * 60)
+def create_chrome_layer(logo, theme_icon, scale=LAYOUT_SCALE, canvas_mode=CANVAS_MODE):
+    """预先合成与语录无关的静态层（背景、网格、角饰、品牌头部、主题插画），整批只渲染一次"""
+    px = functools.partial(scaled, scale=scale)
+    width, height = canvas_size(scale)
+    theme_size = (px(theme_icon_size[0]), px(theme_icon_size[1]))
 
-for idx, (_, row) in enumerate(df.iterrows(), 1):
-    print(f"🔄 处理第 {idx}/{len(df)} 条语录: ID {row['id']}")
-    
     # 创建渐变背景
-    bg = create_gradient_bg(IMG_WIDTH, IMG_HEIGHT, BACKGROUND_TOP, BACKGROUND_BOTTOM)
-    
+    bg = create_gradient_bg(width, height, BACKGROUND_TOP, BACKGROUND_BOTTOM, canvas_mode)
+
     # --- 添加微妙背景图案 ---
-    bg = draw_subtle_pattern(bg, IMG_WIDTH, IMG_HEIGHT)
-    
+    bg = draw_subtle_pattern(bg, width, height, scale)
+
     # 创建绘制对象
-    draw = ImageDraw.Draw(bg)
-    
+    draw = canvas_draw(bg)
+
     # --- 添加角落装饰 ---
-    add_corner_decorations(draw, IMG_WIDTH, IMG_HEIGHT)
-    
+    add_corner_decorations(draw, width, height, scale)
+
     # --- 品牌头部：左边logo图片 + 右边文字 ---
     # 左侧：logo图片
-    logo_size = (180, 180)  # 适中的logo大小
-    logo_resized = logo.resize(logo_size, Image.Resampling.LANCZOS)
-    
+    logo_size = (px(brand_logo_size[0]), px(brand_logo_size[1]))  # 适中的logo大小
+    logo_resized = logo if logo.size == logo_size else logo.resize(logo_size, Image.Resampling.LANCZOS)
+
     # 右侧：每天一点心理学 文字
     title_text = "每天一点心理学"
-    title_font_size = 95
+    title_font_size = px(95)
     title_color = (60, 60, 60)
-    
+
     # 创建字体
-    try:
-        brand_font = ImageFont.truetype(font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", title_font_size)
-    except:
-        brand_font = ImageFont.load_default()
-    
+    brand_font = font_registry.get(title_font_size)
+
     # 渲染标题文字
-    title_img, title_w, title_h = render_text_with_supersampling(title_text, title_font_size, title_color)
-    
+    title_img, title_w, title_h = render_text_with_supersampling(title_text, title_font_size, title_color, scale=scale)
+
     # 计算总宽度和居中位置
-    separator_w = 60  # 分隔符宽度
+    separator_w = px(60)  # 分隔符宽度
     total_w = logo_size[0] + separator_w + title_w
-    start_x = (IMG_WIDTH - total_w) // 2
-    brand_y = 200  # 顶部位置
-    
+    start_x = (width - total_w) // 2
+    brand_y = px(200)  # 顶部位置
+
     # 放置logo图片（左侧）
     logo_x = start_x
     logo_y = brand_y
-    
-    # 添加logo阴影
-    logo_shadow_offset = 4
+
+    # 添加logo阴影（沿logo形状的柔和投影）
+    logo_shadow_offset = px(4)
     logo_shadow_color = (0, 0, 0, 50)
-    logo_shadow_bg = Image.new('RGBA', logo_size, logo_shadow_color)
-    bg.paste(logo_shadow_bg, (logo_x + logo_shadow_offset, logo_y + logo_shadow_offset), logo_shadow_bg)
+    shadow_cache.paste(bg, ("logo", logo_size), lambda: alpha_of(logo_resized), px(8), logo_shadow_color,
+                       (logo_x + logo_shadow_offset, logo_y + logo_shadow_offset))
     bg.paste(logo_resized, (logo_x, logo_y), logo_resized)
-    
+
     # 绘制分隔符 "|"
-    separator_x = logo_x + logo_size[0] + 20
+    separator_x = logo_x + logo_size[0] + px(20)
     separator_y = brand_y + (logo_size[1] - title_h) // 2  # 与文字垂直居中
     separator_color = (120, 120, 120)
     draw.text((separator_x, separator_y), "|", font=brand_font, fill=separator_color)
-    
+
     # 放置标题文字（右侧）
-    title_x = separator_x + 40
+    title_x = separator_x + px(40)
     title_y = brand_y + (logo_size[1] - title_h) // 2  # 与logo垂直居中
     bg.paste(title_img, (title_x, title_y), title_img)
-    
+
     # 添加品牌装饰线
-    brand_line_y = brand_y + logo_size[1] + 30
+    brand_line_y = brand_y + logo_size[1] + px(30)
     brand_line_color = (120, 120, 120, 150)
-    line_length = total_w + 100
-    line_x = (IMG_WIDTH - line_length) // 2
+    line_length = total_w + px(100)
+    line_x = (width - line_length) // 2
     draw.line([(line_x, brand_line_y), (line_x + line_length, brand_line_y)], 
-              fill=brand_line_color, width=3)
+              fill=brand_line_color, width=px(3))
 
     # --- 主题插画居中 ---
-    theme_icon_x = (IMG_WIDTH - theme_icon_size[0]) // 2  # 水平居中
-    theme_icon_y = brand_line_y + 100  # 在品牌线下方100px
-    
+    theme_icon_x = (width - theme_size[0]) // 2  # 水平居中
+    theme_icon_y = brand_line_y + px(100)  # 在品牌线下方100px
+
     # 为theme图标添加阴影
-    icon_shadow_offset = 5
+    icon_shadow_offset = px(5)
     icon_shadow_color = (0, 0, 0, 70)
-    shadow_bg = Image.new('RGBA', theme_icon_size, icon_shadow_color)
-    bg.paste(shadow_bg, (theme_icon_x + icon_shadow_offset, theme_icon_y + icon_shadow_offset), shadow_bg)
+    shadow_cache.paste(bg, ("theme_icon", theme_size), lambda: alpha_of(theme_icon), px(12), icon_shadow_color,
+                       (theme_icon_x + icon_shadow_offset, theme_icon_y + icon_shadow_offset))
     bg.paste(theme_icon, (theme_icon_x, theme_icon_y), theme_icon)
 
+    return bg, theme_icon_y
+
+# ========== 增量构建 ==========
+MANIFEST_SAVE_INTERVAL = 50  # 每渲染多少张保存一次构建清单
+
+# ========== 资源与单条语录渲染 ==========
+# 预设图标大小
+brand_logo_size = (180, 180)  # 品牌头部logo
+theme_icon_size = (500, 500)  # 缩小到原来一半大小（原480px的一半）
+home_icon_size = (500, 500)   # 保持4倍放大
+
+def load_assets(scale=LAYOUT_SCALE, canvas_mode=CANVAS_MODE):
+    """载入logo和图标并预合成静态模板层（每个进程只需调用一次）"""
+    logo = asset_cache.get(logo_path, (scaled(brand_logo_size[0], scale), scaled(brand_logo_size[1], scale)))
+    theme_icon = load_icon(theme_icon_path, (scaled(theme_icon_size[0], scale), scaled(theme_icon_size[1], scale)))
+    home_icon = load_icon(home_icon_path, (scaled(home_icon_size[0], scale), scaled(home_icon_size[1], scale)))
+
+    # 预合成静态模板层（整批共享）
+    chrome_layer, theme_icon_y = create_chrome_layer(logo, theme_icon, scale, canvas_mode)
+    if canvas_mode == "RGB":
+        # 模板层已包含渐变，省内存模式下不再常驻一份整帧渐变模板
+        clear_gradient_cache()
+
+    return {
+        "scale": scale,
+        "logo": logo,
+        "theme_icon": theme_icon,
+        "home_icon": home_icon,
+        "chrome_layer": chrome_layer,
+        "theme_icon_y": theme_icon_y,
+    }
+
+def render_quote(row, assets, log=print, profiler=NULL_PROFILER):
+    """在静态模板层上绘制单条语录（主题、正文、反思、home图标），返回完整画布"""
+    # 所有坐标以 4K 为基准，按模板层的缩放比例换算
+    scale = assets["scale"]
+    px = functools.partial(scaled, scale=scale)
+    width = assets["chrome_layer"].width
+
+    # 从静态模板层开始，只在其上绘制与本条语录相关的内容
+    bg = assets["chrome_layer"].copy()
+    draw = canvas_draw(bg)
+    profiler.lap("background")
+
     # --- 主题小标题（回到原来的浮动位置） ---
     content_text = row['content'].strip()
     theme_keyword = extract_theme_keyword(content_text)
-    theme_font_size = 140
+    theme_font_size = px(140)
     theme_color = (50, 90, 140, 255)
-    theme_img, theme_w, theme_h = render_text_with_supersampling(theme_keyword, theme_font_size, theme_color)
+    theme_img, theme_w, theme_h = render_text_with_supersampling(theme_keyword, theme_font_size, theme_color, scale=scale)
 
     # --- 主题标题居中（在插画下方） ---
-    theme_y = theme_icon_y + theme_icon_size[1] + 60  # 在插画下方60px
-    theme_x = (IMG_WIDTH - theme_w) // 2
+    theme_y = assets["theme_icon_y"] + assets["theme_icon"].height + px(60)  # 在插画下方60px
+    theme_x = (width - theme_w) // 2
     
-    # 为主题词添加微妙阴影效果
-    shadow_offset = 6
+    # 为主题词添加微妙阴影效果（由文字蒙版模糊而来，每个主题词只生成一次）
+    shadow_offset = px(6)
     shadow_color = (50, 90, 140, 80)  # 浅色阴影
-    shadow_img, _, _ = render_text_with_supersampling(theme_keyword, theme_font_size, shadow_color)
-    bg.paste(shadow_img, (theme_x + shadow_offset, theme_y + shadow_offset), shadow_img)
+    shadow_key = ("theme_text", theme_keyword, theme_font_size, antialias_policy.factor_for(theme_font_size), text_backend)
+    shadow_cache.paste(bg, shadow_key, lambda: render_text_mask(theme_keyword, theme_font_size, scale=scale), px(4),
+                       shadow_color, (theme_x + shadow_offset, theme_y + shadow_offset))
     
     # 粘贴主题词
     bg.paste(theme_img, (theme_x, theme_y), theme_img)
     
     # 主题标题下方添加现代化装饰线组
-    line_length = theme_w + 100  # 进一步增加装饰线长度
-    line_x = (IMG_WIDTH - line_length) // 2
-    line_y = theme_y + theme_h + 30  # 增加更多间距
+    line_length = theme_w + px(100)  # 进一步增加装饰线长度
+    line_x = (width - line_length) // 2
+    line_y = theme_y + theme_h + px(30)  # 增加更多间距
     
     # 现代化四线设计，创造丰富层次
     draw.line([(line_x, line_y), (line_x + line_length, line_y)], 
-              fill=(50, 90, 140, 220), width=5)  # 主线，最粗最深
-    draw.line([(line_x + 40, line_y + 12), (line_x + line_length - 40, line_y + 12)], 
-              fill=(80, 120, 160, 160), width=3)  # 中粗线
-    draw.line([(line_x + 70, line_y + 22), (line_x + line_length - 70, line_y + 22)], 
-              fill=(120, 150, 180, 120), width=2)  # 细线
-    draw.line([(line_x + 90, line_y + 30), (line_x + line_length - 90, line_y + 30)], 
+              fill=(50, 90, 140, 220), width=px(5))  # 主线，最粗最深
+    draw.line([(line_x + px(40), line_y + px(12)), (line_x + line_length - px(40), line_y + px(12))], 
+              fill=(80, 120, 160, 160), width=px(3))  # 中粗线
+    draw.line([(line_x + px(70), line_y + px(22)), (line_x + line_length - px(70), line_y + px(22))], 
+              fill=(120, 150, 180, 120), width=px(2))  # 细线
+    draw.line([(line_x + px(90), line_y + px(30)), (line_x + line_length - px(90), line_y + px(30))], 
               fill=(170, 180, 190, 80), width=1)  # 最轻装饰线
     
     # --- 上装饰分隔栏（确保在主题词下方） ---
-    divider_y_top = max(theme_y + theme_h + 100, 1320)  # 确保分割线在主题词下方，保持浮动结构
-    draw_decorative_divider(draw, 0, divider_y_top, IMG_WIDTH, "elegant")
+    divider_y_top = max(theme_y + theme_h + px(100), px(1320))  # 确保分割线在主题词下方，保持浮动结构
+    draw_decorative_divider(draw, 0, divider_y_top, width, "elegant", scale)
+
+    profiler.lap("theme")
 
     # --- 主体心理句 (动态字体大小 + 增强行距 + 柔和背景) ---
     content_length = len(content_text)
     
-    # 根据文本长度动态调整字体大小和换行宽度
-    optimal_font_size = get_optimal_font_size(content_length)
-    
-    # 进一步增加换行宽度，极大化内容显示范围
-    if optimal_font_size >= 140:
-        wrap_width = 14  # 大字体，进一步增加每行字数
-    elif optimal_font_size >= 120:
-        wrap_width = 18  # 中字体，显著增加
-    elif optimal_font_size >= 100:
-        wrap_width = 22  # 小字体，大幅增加
-    else:
-        wrap_width = 26  # 最小字体，最大化利用空间
-    
-    text = textwrap.fill(content_text, width=wrap_width)
-    
     # 使用增强的行距提升可读性
     line_spacing = 1.8  # 增加到1.8倍，更多留白，更加舒缓
-    main_text_img, text_w, text_h = render_text_with_supersampling(text, optimal_font_size, TEXT_COLOR_MAIN, line_spacing)
+    
+    # 根据文本长度动态调整字体大小，再按实测字宽对照实际可用宽度断行
+    # （遵守避头尾规则，原文空行作为段落分隔；行数过多时继续缩小字号）
+    optimal_font_size, text = fit_main_text(content_text, get_optimal_font_size(content_length), line_spacing, scale)
+    main_font_px = px(optimal_font_size)
+    main_line_width = px(MAIN_TEXT_WIDTH)
+    main_text_img, text_w, text_h = render_text_with_supersampling(text, main_font_px, TEXT_COLOR_MAIN, line_spacing, scale)
+    profiler.note_max("supersample_px", text_w * text_h * antialias_policy.factor_for(main_font_px) ** 2)
     
     # 输出调试信息
-    print(f"   🏷️  主题标签: {theme_keyword}")
-    print(f"   📝 内容长度: {content_length}字 | 字体大小: {optimal_font_size}px | 换行宽度: {wrap_width}字/行 | 行距: {line_spacing}")
+    log(f"   🏷️  主题标签: {theme_keyword}")
+    log(f"   📝 内容长度: {content_length}字 | 字体大小: {optimal_font_size}px | 行宽: {main_line_width}px ({text.count(chr(10)) + 1}行) | 行距: {line_spacing}")
     
     # 主体文本位置（调整到分割线下方）
-    main_text_y = divider_y_top + 150  # 增加更多留白空间
-    text_x = (IMG_WIDTH - text_w) // 2
+    main_text_y = divider_y_top + px(150)  # 增加更多留白空间
+    text_x = (width - text_w) // 2
     
     # --- 为主体文字区域创建极淡渐变背景 ---
     # 计算文字区域范围，增加充足的内边距
-    text_bg_padding_x = 200  # 水平内边距
-    text_bg_padding_y = 100  # 垂直内边距
+    text_bg_padding_x = px(200)  # 水平内边距
+    text_bg_padding_y = px(100)  # 垂直内边距
     text_bg_width = text_w + text_bg_padding_x * 2
     text_bg_height = text_h + text_bg_padding_y * 2
     text_bg_x = text_x - text_bg_padding_x
     text_bg_y = main_text_y - text_bg_padding_y
     
-    # 创建极淡的米白到淡灰渐变
-    text_bg = Image.new("RGBA", (text_bg_width, text_bg_height), (0, 0, 0, 0))
-    text_bg_draw = ImageDraw.Draw(text_bg)
-    
-    # 极淡的渐变色彩（从米白色到淡灰色）
+    # 极淡的渐变色彩（从米白色到淡灰色），附极subtle的边框效果
     top_color = (252, 250, 248, 25)      # 极淡米白，透明度很低
     bottom_color = (240, 240, 240, 35)   # 极淡灰色，透明度很低
-    
-    # 绘制柔和的垂直渐变
-    for y in range(text_bg_height):
-        ratio = y / text_bg_height
-        # 使用缓动函数让渐变更柔和
-        smooth_ratio = ratio * ratio * (3.0 - 2.0 * ratio)  # 平滑插值
-        
-        r = int(top_color[0] * (1 - smooth_ratio) + bottom_color[0] * smooth_ratio)
-        g = int(top_color[1] * (1 - smooth_ratio) + bottom_color[1] * smooth_ratio)
-        b = int(top_color[2] * (1 - smooth_ratio) + bottom_color[2] * smooth_ratio)
-        a = int(top_color[3] * (1 - smooth_ratio) + bottom_color[3] * smooth_ratio)
-        
-        text_bg_draw.line([(0, y), (text_bg_width, y)], fill=(r, g, b, a))
-    
-    # 添加极subtle的边框效果
     border_color = (230, 230, 230, 20)
-    text_bg_draw.rectangle([0, 0, text_bg_width-1, text_bg_height-1], 
-                          outline=border_color, width=1)
+    text_bg = create_soft_panel(text_bg_width, text_bg_height, top_color, bottom_color, border_color)
     
     # 将渐变背景合成到主图
     bg.paste(text_bg, (text_bg_x, text_bg_y), text_bg)
@@ -468,8 +599,10 @@ for idx, (_, row) in enumerate(df.iterrows(), 1):
     bg.paste(main_text_img, (text_x, main_text_y), main_text_img)
     
     # --- 下装饰分隔栏 ---
-    divider_y_bottom = main_text_y + text_h + 150
-    draw_decorative_divider(draw, 0, divider_y_bottom, IMG_WIDTH, "geometric")
+    divider_y_bottom = main_text_y + text_h + px(150)
+    draw_decorative_divider(draw, 0, divider_y_bottom, width, "geometric", scale)
+
+    profiler.lap("main_text")
 
     # --- 引发思考 (动态字体大小 + 增强行距 + 柔和背景) ---
     reflection_text = row['reflection'].strip()
@@ -478,57 +611,35 @@ for idx, (_, row) in enumerate(df.iterrows(), 1):
     # 反思文字也根据长度调整字体大小
     reflection_font_size = get_optimal_font_size(reflection_length, base_font_size=110)
     
-    # 根据字体大小调整换行宽度，进一步增加
-    if reflection_font_size >= 100:
-        reflect_wrap_width = 18  # 增加页边距利用
-    elif reflection_font_size >= 80:
-        reflect_wrap_width = 22
-    else:
-        reflect_wrap_width = 25
-    
-    reflection = textwrap.fill(reflection_text, width=reflect_wrap_width)
+    reflect_font_px = px(reflection_font_size)
+    reflect_line_width = px(REFLECTION_TEXT_WIDTH)
+    reflection = line_breaker.fill(reflection_text, reflect_font_px, reflect_line_width)
     
     # 反思文字也使用舒适的行距
     reflection_line_spacing = 1.7  # 增加行距，更多留白
-    reflect_img, reflect_w, reflect_h = render_text_with_supersampling(reflection, reflection_font_size, TEXT_COLOR_REFLECT, reflection_line_spacing)
+    reflect_img, reflect_w, reflect_h = render_text_with_supersampling(reflection, reflect_font_px, TEXT_COLOR_REFLECT,
+                                                                       reflection_line_spacing, scale)
+    profiler.note_max("supersample_px", reflect_w * reflect_h * antialias_policy.factor_for(reflect_font_px) ** 2)
     
-    print(f"   💭 反思长度: {reflection_length}字 | 字体大小: {reflection_font_size}px | 换行宽度: {reflect_wrap_width}字/行 | 行距: {reflection_line_spacing}")
+    log(f"   💭 反思长度: {reflection_length}字 | 字体大小: {reflection_font_size}px | 行宽: {reflect_line_width}px ({reflection.count(chr(10)) + 1}行) | 行距: {reflection_line_spacing}")
     
-    reflect_text_y = divider_y_bottom + 250  # 增加更多留白
-    reflect_x = (IMG_WIDTH - reflect_w) // 2
+    reflect_text_y = divider_y_bottom + px(250)  # 增加更多留白
+    reflect_x = (width - reflect_w) // 2
     
     # --- 为反思文字区域创建极淡渐变背景 ---
-    reflect_bg_padding_x = 180
-    reflect_bg_padding_y = 80
+    reflect_bg_padding_x = px(180)
+    reflect_bg_padding_y = px(80)
     reflect_bg_width = reflect_w + reflect_bg_padding_x * 2
     reflect_bg_height = reflect_h + reflect_bg_padding_y * 2
     reflect_bg_x = reflect_x - reflect_bg_padding_x
     reflect_bg_y = reflect_text_y - reflect_bg_padding_y
     
-    # 创建极淡的渐变（反思区域用稍微不同的色调）
-    reflect_bg = Image.new("RGBA", (reflect_bg_width, reflect_bg_height), (0, 0, 0, 0))
-    reflect_bg_draw = ImageDraw.Draw(reflect_bg)
-    
-    # 极淡的渐变色彩（从淡蓝白到淡灰白）
+    # 极淡的渐变色彩（从淡蓝白到淡灰白，反思区域用稍微不同的色调），附极subtle的边框
     top_color_reflect = (248, 250, 252, 20)      # 极淡蓝白
     bottom_color_reflect = (245, 245, 247, 30)   # 极淡灰白
-    
-    # 绘制柔和的垂直渐变
-    for y in range(reflect_bg_height):
-        ratio = y / reflect_bg_height
-        smooth_ratio = ratio * ratio * (3.0 - 2.0 * ratio)
-        
-        r = int(top_color_reflect[0] * (1 - smooth_ratio) + bottom_color_reflect[0] * smooth_ratio)
-        g = int(top_color_reflect[1] * (1 - smooth_ratio) + bottom_color_reflect[1] * smooth_ratio)
-        b = int(top_color_reflect[2] * (1 - smooth_ratio) + bottom_color_reflect[2] * smooth_ratio)
-        a = int(top_color_reflect[3] * (1 - smooth_ratio) + bottom_color_reflect[3] * smooth_ratio)
-        
-        reflect_bg_draw.line([(0, y), (reflect_bg_width, y)], fill=(r, g, b, a))
-    
-    # 添加极subtle的边框
     border_color_reflect = (220, 225, 230, 15)
-    reflect_bg_draw.rectangle([0, 0, reflect_bg_width-1, reflect_bg_height-1], 
-                             outline=border_color_reflect, width=1)
+    reflect_bg = create_soft_panel(reflect_bg_width, reflect_bg_height,
+                                   top_color_reflect, bottom_color_reflect, border_color_reflect)
     
     # 将渐变背景合成到主图
     bg.paste(reflect_bg, (reflect_bg_x, reflect_bg_y), reflect_bg)
@@ -536,47 +647,635 @@ for idx, (_, row) in enumerate(df.iterrows(), 1):
     # 为反思文字添加柔和的引号装饰
     quote_size = 35  # 稍微缩小引号
     quote_color = (180, 180, 180, 80)  # 更淡的引号
+    quote_font = font_registry.get(px(quote_size * 2))
     
     # 左引号
-    left_quote_x = reflect_x - 70
-    left_quote_y = reflect_text_y - 15
-    draw.text((left_quote_x, left_quote_y), '"', font=ImageFont.truetype(
-        font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", quote_size*2), 
-        fill=quote_color)
+    left_quote_x = reflect_x - px(70)
+    left_quote_y = reflect_text_y - px(15)
+    draw.text((left_quote_x, left_quote_y), '"', font=quote_font, fill=quote_color)
     
     # 右引号
-    right_quote_x = reflect_x + reflect_w + 30
-    right_quote_y = reflect_text_y + reflect_h - 50
-    draw.text((right_quote_x, right_quote_y), '"', font=ImageFont.truetype(
-        font_path if os.path.exists(font_path) else "C:/Windows/Fonts/msyh.ttc", quote_size*2), 
-        fill=quote_color)
+    right_quote_x = reflect_x + reflect_w + px(30)
+    right_quote_y = reflect_text_y + reflect_h - px(50)
+    draw.text((right_quote_x, right_quote_y), '"', font=quote_font, fill=quote_color)
     
     # 粘贴反思文字（在柔和背景之上）
     bg.paste(reflect_img, (reflect_x, reflect_text_y), reflect_img)
     
+    profiler.lap("reflection")
+
     # --- Home图标（反思内容下方，4倍放大） ---
-    home_icon_x = (IMG_WIDTH - home_icon_size[0]) // 2  # 水平居中
-    home_icon_y = reflect_text_y + reflect_h + 100  # 在反思内容下方，增加间距
+    home_icon = assets["home_icon"]
+    home_icon_x = (width - home_icon.width) // 2  # 水平居中
+    home_icon_y = reflect_text_y + reflect_h + px(100)  # 在反思内容下方，增加间距
     
     # 为home图标添加更明显的阴影（适配大图标）
-    home_shadow_offset = 6  # 增大阴影偏移
+    home_shadow_offset = px(6)  # 增大阴影偏移
     home_shadow_color = (0, 0, 0, 70)
-    home_shadow_bg = Image.new('RGBA', home_icon_size, home_shadow_color)
-    bg.paste(home_shadow_bg, (home_icon_x + home_shadow_offset, home_icon_y + home_shadow_offset), home_shadow_bg)
+    shadow_cache.paste(bg, ("home_icon", home_icon.size), lambda: alpha_of(home_icon), px(14), home_shadow_color,
+                       (home_icon_x + home_shadow_offset, home_icon_y + home_shadow_offset))
     bg.paste(home_icon, (home_icon_x, home_icon_y), home_icon)
     
     # --- 底部装饰线条 ---
-    bottom_line_y = home_icon_y + home_icon_size[1] + 60  # 调整到home图标下方
+    bottom_line_y = home_icon_y + home_icon.height + px(60)  # 调整到home图标下方
     line_color = (140, 140, 140, 100)
-    draw.line([(IMG_WIDTH//4, bottom_line_y), (IMG_WIDTH*3//4, bottom_line_y)], 
-              fill=line_color, width=3)
+    draw.line([(width//4, bottom_line_y), (width*3//4, bottom_line_y)], 
+              fill=line_color, width=px(3))
+    profiler.lap("home_icon")
 
-    # --- 保存超高质量图片 ---
-    filename = os.path.join(output_dir, f"{row['id']}_独白之所_超清抗锯齿.png")
-    
-    bg.save(filename, "PNG", optimize=False, compress_level=0, dpi=(DPI, DPI))
-    
-    file_size = os.path.getsize(filename) / (1024 * 1024)
-    print(f"📸 生成图片: {os.path.basename(filename)} ({file_size:.1f}MB)")
+    return bg
+
+def card_filename(quote_id, extension=".png", scale=LAYOUT_SCALE, size=None):
+    """语录对应的输出文件路径；非 4K 尺寸（缩放渲染或派生尺寸 size）在文件名中标注像素尺寸，不会覆盖 4K 成品"""
+    if size is None and scale == 1:
+        return os.path.join(output_dir, f"{quote_id}_独白之所_超清抗锯齿{extension}")
+    width, height = size or canvas_size(scale)
+    return os.path.join(output_dir, f"{quote_id}_独白之所_{width}x{height}{extension}")
+
+def save_card(bg, quote_id, encoder=None, scale=LAYOUT_SCALE, size=None, sink=None):
+    """编码并保存图片，返回 (文件路径, 字节数, 编码耗时)；size 为派生尺寸时按派生尺寸命名"""
+    encoder = encoder or get_encoder()
+    data, encode_seconds = encoder.encode(bg, dpi=DPI)
+    filename = card_filename(quote_id, encoder.extension, scale, size)
+    # 默认直接写入输出目录；归档模式下追加到归档（或暂存后交给主进程追加）
+    sink = sink or DirectorySink(os.path.dirname(filename))
+    return sink.write(quote_id, os.path.basename(filename), data), len(data), encode_seconds
+
+def remove_partial_outputs(directory):
+    """删除被强行中止的进程留下的临时输出文件，返回删除的个数"""
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith(PARTIAL_SUFFIX) and "_独白之所_" in name:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
+
+# 决定输出像素和编码字节的模块（渲染路径上的全部导入）；基准测试、调试工具、清单、归档等不在其中
+RENDER_MODULES = ("antialias.py", "asset_cache.py", "encoders.py", "fonts.py", "glyph_atlas.py", "gradient.py",
+                  "linebreak.py", "main_antialiasing.py", "shadows.py", "text_masks.py", "themes.py")
+
+def render_signature(encoder, scale=LAYOUT_SCALE, canvas_mode=CANVAS_MODE):
+    """影响输出像素的全部因素：版式常量、渲染代码、字体和图标文件（用于增量构建）"""
+    return {
+        "canvas": [IMG_WIDTH, IMG_HEIGHT, DPI, scale, canvas_mode],
+        "colors": [BACKGROUND_TOP, BACKGROUND_BOTTOM, TEXT_COLOR_MAIN, TEXT_COLOR_REFLECT],
+        "text": [FONT_SIZE_MAIN, FONT_SIZE_REFLECT],
+        "antialias": antialias_policy.describe(),
+        "text_backend": text_backend,
+        "icons": [brand_logo_size, theme_icon_size, home_icon_size],
+        # 版式偏移量和绘制细节写在代码里：渲染路径上全部模块的哈希一并纳入，任何一个改动都会使清单失效
+        "code": [[name, file_sha256(os.path.join(script_dir, name))] for name in RENDER_MODULES],
+        "themes": file_sha256(theme_keywords_path),
+        "font": file_sha256(font_registry.font_path),
+        "assets": [file_sha256(path) for path in (logo_path, theme_icon_path, home_icon_path)],
+        "encoder": encoder.describe(),
+    }
+
+# ========== 可复用渲染器 ==========
+def _quiet(*_):
+    pass
+
+class CardRenderer:
+    """配置一次、常驻复用的卡片渲染器
+
+    构造时不做任何 I/O；字体、解码后的图标和静态模板层在第一次渲染（或 warm_up）时载入，
+    之后每张卡片只绘制与语录相关的内容。适合嵌入长期运行的服务。
+    """
+
+    def __init__(self, encoder=None, antialias=ANTIALIAS_MODE, aa_threshold=AA_QUALITY_THRESHOLD,
+                 scale=LAYOUT_SCALE, canvas_mode=CANVAS_MODE, text_backend=TEXT_BACKEND, output_sizes=(), sink=None):
+        self.encoder = encoder or get_encoder()
+        self.sink = sink or DirectorySink(output_dir)  # 输出去向：目录（默认）或归档
+        self.antialias = antialias
+        self.aa_threshold = aa_threshold
+        self.text_backend = text_backend
+        self.scale = scale  # 1.0 为 4K 成品，PREVIEW_SCALE 为快速预览
+        self.canvas_mode = canvas_mode
+        # 派生尺寸（从大到小），只保留比画布小的尺寸
+        width, height = canvas_size(scale)
+        self.output_sizes = [size for size in output_sizes if size[0] <= width and size[1] <= height
+                             and size != (width, height)]
+        self.assets = None
+        self.setup_ms = 0.0  # 载入资源和预合成模板层的耗时
+
+    def warm_up(self):
+        """载入资源并预合成静态模板层，已载入时直接返回"""
+        configure_antialias(self.antialias, self.aa_threshold)
+        configure_text_backend(self.text_backend)
+        if self.assets is None:
+            start = time.perf_counter()
+            self.assets = load_assets(self.scale, self.canvas_mode)
+            self.setup_ms = (time.perf_counter() - start) * 1000
+        return self
+
+    def render(self, quote, log=_quiet, profiler=NULL_PROFILER):
+        """渲染一条语录（至少包含 content / reflection 字段的字典），返回画布（RGBA 或 RGB）"""
+        self.warm_up()
+        canvas = render_quote(quote, self.assets, log=log, profiler=profiler)
+        if self.text_backend == "atlas":
+            # 常驻进程不一定有机会在退出时写盘，新增字形积累到一定数量就先保存
+            glyph_atlases.save(min_pending=ATLAS_SAVE_INTERVAL)
+        return canvas
+
+    def render_many(self, quotes, log=_quiet):
+        """依次渲染多条语录，逐条产出 (语录, 画布)，内存中只保留当前一张"""
+        for quote in quotes:
+            yield quote, self.render(quote, log=log)
+
+    def encode(self, canvas):
+        """用本渲染器的编码器编码画布，返回 (字节串, 编码耗时秒数)"""
+        return self.encoder.encode(canvas, dpi=DPI)
+
+    def save(self, canvas, quote_id):
+        """编码并写入输出去向，返回 (文件路径, 字节数, 编码耗时)"""
+        return save_card(canvas, quote_id, self.encoder, self.scale, sink=self.sink)
+
+    def save_derived(self, canvas, quote_id):
+        """从内存中的画布级联缩小并写入各派生尺寸，返回 [(文件路径, 字节数, 编码耗时)]"""
+        return [save_card(image, quote_id, self.encoder, self.scale, size, sink=self.sink)
+                for size, image in derive_sizes(canvas, self.output_sizes)]
+
+    def output_paths(self, quote_id):
+        """一条语录的全部输出文件（主图 + 派生尺寸）"""
+        extension = self.encoder.extension
+        return [card_filename(quote_id, extension, self.scale),
+                *(card_filename(quote_id, extension, self.scale, size) for size in self.output_sizes)]
+
+    def stats(self):
+        """字体和文字蒙版缓存的统计信息"""
+        return {"fonts": font_registry.stats(), "text_masks": text_mask_cache.stats(),
+                "glyph_atlas": glyph_atlases.stats(), "shadows": shadow_cache.stats()}
+
+    def close(self):
+        """保存图集中新增的字形"""
+        if self.text_backend == "atlas":
+            glyph_atlases.save()
+
+# ========== 并行批量渲染 ==========
+# 每个工作进程各自持有一个渲染器（已解码的资源和模板层）
+_worker_renderer = None
+_worker_profile = False
+_worker_setup_ms = 0.0  # 模板层构建耗时，记入该进程第一条语录的 chrome 阶段
+_worker_abort = None    # 主进程决定立即中止时置位的事件（多进程模式）
+_worker_stop = None     # 主进程收到第一次停止信号时置位的事件：尚未开始的任务直接放弃（多进程模式）
+
+def _handle_worker_sigterm(signum, frame):
+    """工作进程的 SIGTERM：主进程已要求中止（pool.terminate）时立即退出，否则忽略
+
+    发给整个进程组的 SIGTERM（kill -TERM -<pgid>、systemctl stop）由主进程统一处理，
+    工作进程照常完成手上的卡片；若工作进程被直接杀死，进程池会丢失它的任务并一直等待。
+    退出用 SystemExit 而不是 os._exit：空闲的工作进程在等任务时持有任务队列的锁，
+    直接退出会把锁带走，pool.terminate 随后获取这把锁时永远等不到。
+    """
+    if _worker_abort is None or _worker_abort.is_set():
+        raise SystemExit(128 + signum)
+
+def _init_worker(encoder=None, profile=None, renderer_options=None, abort_event=None, stop_event=None):
+    """工作进程初始化：字体、图标和静态模板层只载入一次"""
+    global _worker_renderer, _worker_profile, _worker_setup_ms, _worker_abort, _worker_stop
+    if abort_event is not None:
+        _worker_abort = abort_event
+    if stop_event is not None:
+        _worker_stop = stop_event
+    if profile is not None:
+        _worker_profile = profile
+    if _worker_profile and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if multiprocessing.parent_process() is not None:
+        # 停止信号由主进程统一处理：Ctrl+C 和发给进程组的 SIGTERM 都不打断工作进程中的卡片
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, _handle_worker_sigterm)
+    if _worker_renderer is None or encoder is not None or renderer_options is not None:
+        _worker_renderer = CardRenderer(encoder, **(renderer_options or {}))
+        if multiprocessing.parent_process() is not None:
+            # 工作进程正常退出（pool.close 之后）时保存本进程新增的字形
+            multiprocessing.util.Finalize(_worker_renderer, _worker_renderer.close, exitpriority=10)
+    _worker_setup_ms = _worker_renderer.warm_up().setup_ms
+
+def _render_task(task):
+    """渲染并保存一条语录；单条失败只记录错误，不中断整批
+
+    主进程已收到停止信号时，还没开始的任务不再渲染，返回 {"cancelled": True}，留给 --resume 处理。
+    """
+    idx, row, fingerprint = task
+    if _worker_stop is not None and _worker_stop.is_set():
+        return {"idx": idx, "id": row['id'], "cancelled": True}
+    result = {"idx": idx, "id": row['id'], "fingerprint": fingerprint, "logs": [],
+              "filename": None, "bytes": 0, "encode_seconds": 0.0, "derived": [], "payloads": [], "error": None, "pid": os.getpid()}
+    global _worker_setup_ms
+    try:
+        if _worker_renderer is None or _worker_renderer.assets is None:
+            _init_worker()
+        # 单张内存峰值：Pillow 像素缓冲区不经过 tracemalloc，按渲染这张卡片期间的进程 RSS 峰值统计（仅 Linux）。
+        # 分配器会复用上一张卡片释放的内存，增量并不可靠，所以记录绝对值，即每个工作进程实际需要的内存
+        rss_tracked = reset_peak_rss()
+        profiler = QuoteProfiler(row['id']) if _worker_profile else NULL_PROFILER
+        if _worker_setup_ms:
+            profiler.add_span("chrome", _worker_setup_ms)
+            _worker_setup_ms = 0.0
+        bg = _worker_renderer.render(row, log=result["logs"].append, profiler=profiler)
+        with profiler.span("save"):
+            result["filename"], result["bytes"], result["encode_seconds"] = _worker_renderer.save(bg, row['id'])
+            result["derived"] = _worker_renderer.save_derived(bg, row['id'])
+            result["payloads"] = _worker_renderer.sink.drain()
+        result["canvas_bytes"] = bg.width * bg.height * len(bg.getbands())
+        peak_kb = read_status_kb("VmHWM") if rss_tracked else None
+        if peak_kb is not None:
+            result["peak_bytes"] = peak_kb * 1024
+        if _worker_profile:
+            result["trace"] = profiler.to_record()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["font_stats"] = font_registry.stats()
+    result["mask_stats"] = text_mask_cache.stats()
+    result["atlas_stats"] = glyph_atlases.stats()
+    return result
+
+def _imap_windowed(pool, func, iterable, window):
+    """滑动窗口提交：最多 window 个任务在途，按提交顺序产出结果
+
+    每取走一个结果就补交一个任务，进程池始终有活可干（不会在批次边界等最慢的一张），
+    又不会像 Pool.imap 那样一次性消费整个迭代器。
+    """
+    iterator = iter(iterable)
+    pending = collections.deque(pool.apply_async(func, (item,)) for item in itertools.islice(iterator, window))
+    while pending:
+        result = pending.popleft().get()
+        for item in itertools.islice(iterator, 1):
+            pending.append(pool.apply_async(func, (item,)))
+        yield result
+
+# ========== 像素等价校验 ==========
+VERIFY_STATUS_LABELS = {
+    "identical": "✅ 完全一致",
+    "within_tolerance": "🟡 容差内",
+    "drift": "❌ 偏差",
+    "missing": "⚠️  无参考",
+    "stale": "⚠️  内容已变",
+}
+
+def verification_signature(encoder, scale, canvas_mode):
+    """参考集记录的渲染签名（与输出编码无关，统一为 JSON 形式便于比较）"""
+    signature = json.loads(json.dumps(render_signature(encoder, scale, canvas_mode)))
+    signature.pop("encoder", None)
+    return signature
+
+def run_verification(args, renderer):
+    """--record-reference 录制参考集；--verify 与参考集逐张比较，返回退出码（有偏差时为 1）"""
+    reference = ReferenceSet(args.reference_dir)
+    signature = verification_signature(renderer.encoder, args.scale, args.canvas)
+    rows = iter_quotes(quotes_path, on_error=lambda e: print(f"⚠️  跳过格式错误的语录: {e}"))
+
+    if args.record_reference:
+        reference.load()
+        for row in rows:
+            reference.record(row, renderer.render(row))
+            print(f"📌 已记录参考: ID {row['id']}")
+        reference.signature = signature
+        reference.save()
+        print(f"✅ 参考集已保存: {reference.index_path}（{len(reference.entries)} 张）")
+        return 0
+
+    if not reference.load():
+        print(f"❌ 未找到参考集: {reference.index_path}（先用 --record-reference 录制）")
+        return 2
+    changes = reference.signature_changes(signature)
+    if changes:
+        print(f"🔧 与参考集相比变化的渲染设置: {', '.join(changes)}")
+    tolerance_text = f"缩略图最大差异 ≤ {args.verify_tolerance:g}" if args.verify_tolerance > 0 else "逐像素一致"
+    print(f"🔍 校验标准: {tolerance_text}")
+
+    counts = {}
+    for row in rows:
+        result = reference.compare(row, renderer.render(row), args.verify_tolerance)
+        counts[result.status] = counts.get(result.status, 0) + 1
+        detail = ""
+        if result.mean_diff is not None and result.status != "identical":
+            detail = f" | 平均差异 {result.mean_diff:.3f} | 最大差异 {result.max_diff}"
+        if result.diff_path:
+            detail += f" | 对比图 {os.path.relpath(result.diff_path, project_root)}"
+        print(f"{VERIFY_STATUS_LABELS[result.status]}: ID {result.quote_id}{detail}")
+
+    print("=" * 60)
+    print("📋 校验结果: " + " | ".join(f"{VERIFY_STATUS_LABELS[status].split()[-1]} {count} 张"
+                                    for status, count in counts.items()))
+    failed = sum(count for status, count in counts.items() if status not in PASSING_STATUSES)
+    if counts.get(STATUS_DRIFT):
+        print(f"❌ {counts[STATUS_DRIFT]} 张卡片与参考不一致，对比图见 {os.path.join(args.reference_dir, 'diffs')}")
+    return 1 if failed else 0
+
+def parse_archive_path(value):
+    """归档路径：按扩展名选择 tar 或 zip；不带目录时放在输出目录下"""
+    if archive_format(value) is None:
+        raise argparse.ArgumentTypeError(f"不支持的归档格式: {value}（可选: {', '.join(ARCHIVE_FORMATS)}）")
+    return value if os.path.dirname(value) else os.path.join(output_dir, value)
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="批量生成专业级抗锯齿4K心理语录图片")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行进程数（默认1为单进程，0表示使用全部CPU核心）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量构建：只重新渲染内容、版式或资源有变化以及输出缺失的语录")
+    parser.add_argument("--resume", action="store_true",
+                        help="从上一次中断的任务继续：跳过任务日志中已完成且输出文件完整的语录")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=DEFAULT_PRESET,
+                        help=f"输出预设（默认 {DEFAULT_PRESET}：未压缩PNG）")
+    parser.add_argument("--encoder", choices=sorted(ENCODER_FACTORIES),
+                        help="直接指定编码器，覆盖预设")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP 质量 (1-100)")
+    parser.add_argument("--compress-level", type=int, choices=range(10), metavar="0-9",
+                        help="PNG zlib 压缩级别")
+    parser.add_argument("--antialias", choices=[*ANTIALIAS_MODES, AUTO_MODE], default=ANTIALIAS_MODE,
+                        help=f"文字抗锯齿模式（默认 {ANTIALIAS_MODE}；auto 按字号自动选择满足质量阈值的最低倍数）")
+    parser.add_argument("--aa-threshold", type=float, default=AA_QUALITY_THRESHOLD,
+                        help=f"auto 模式相对 4x 参考的覆盖率误差阈值，单位%%（默认 {AA_QUALITY_THRESHOLD}）")
+    parser.add_argument("--text-backend", choices=TEXT_BACKENDS, default=TEXT_BACKEND,
+                        help="文字光栅化后端（默认 freetype；atlas 使用持久化字形图集，每个字形只光栅化一次）")
+    parser.add_argument("--scale", type=float, default=LAYOUT_SCALE,
+                        help="排版缩放比例（默认1.0为4K成品；版式坐标均按比例换算）")
+    parser.add_argument("--preview", action="store_const", const=PREVIEW_SCALE, dest="scale",
+                        help=f"快速预览：等同于 --scale {PREVIEW_SCALE}，像素约为4K的1/16")
+    parser.add_argument("--canvas", choices=CANVAS_MODES, default=CANVAS_MODE,
+                        help="画布模式（默认 RGBA；RGB 为省内存模式，半透明元素只在包围盒内混合）")
+    parser.add_argument("--sizes", type=parse_output_sizes, default=[],
+                        help=f"同时输出的派生尺寸，逗号分隔：预设（{', '.join(f'{k}={w}x{h}' for k, (w, h) in OUTPUT_SIZE_PRESETS.items())}）、"
+                             "WxH 或宽度；从内存画布逐级缩小，不重新渲染")
+    parser.add_argument("--archive", type=parse_archive_path,
+                        help=f"把全部卡片依次写入单个归档（{' / '.join(ARCHIVE_FORMATS)}，不压缩），"
+                             "并在旁边写出 .index.jsonl 索引；只给文件名时放在 output/ 下")
+    parser.add_argument("--record-reference", action="store_true",
+                        help="用当前流水线渲染全部语录，记录像素哈希和参考缩略图（不写输出图片）")
+    parser.add_argument("--verify", action="store_true",
+                        help="渲染全部语录并与参考集比较，有偏差时输出对比图并返回非零退出码（不写输出图片）")
+    parser.add_argument("--verify-tolerance", type=float, default=0.0,
+                        help="允许的缩略图逐像素最大差异（0-255，默认 0 即要求逐像素一致）")
+    parser.add_argument("--reference-dir", default=reference_dir, help="参考集目录（默认 reference/）")
+    parser.add_argument("--profile", action="store_true",
+                        help="记录每条语录各阶段耗时和内存峰值（JSON Lines），批次结束打印汇总表")
+    parser.add_argument("--trace-file", default=os.path.join(output_dir, "render_trace.jsonl"),
+                        help="--profile 的明细输出路径")
+    args = parser.parse_args(argv)
+    if not 0 < args.scale <= 1:
+        parser.error(f"--scale 必须在 (0, 1] 范围内（1 为 4K 成品），当前为 {args.scale:g}")
+    if args.workers < 0:
+        parser.error("--workers 不能为负数（0 表示使用全部CPU核心）")
+    if args.archive and (args.incremental or args.resume):
+        parser.error("--archive 每次重新写出整个归档，不能与 --incremental / --resume 同时使用")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    encoder = get_encoder(args.encoder, args.preset, args.quality, args.compress_level)
+    configure_antialias(args.antialias, args.aa_threshold)
+    configure_text_backend(args.text_backend)
+    renderer_options = {"antialias": args.antialias, "aa_threshold": args.aa_threshold, "scale": args.scale,
+                        "canvas_mode": args.canvas, "text_backend": args.text_backend, "output_sizes": args.sizes}
+    # 单进程模式直接用它渲染；多进程时只用于规划输出文件名
+    renderer = CardRenderer(encoder, **renderer_options)
+    if args.verify or args.record_reference:
+        code = run_verification(args, renderer)
+        if code:
+            sys.exit(code)
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    partial = remove_partial_outputs(output_dir)
+    if partial:
+        print(f"🧹 已清理上次中止时留下的 {partial} 个临时文件")
+    archive = None
+    if args.archive:
+        # 归档只由主进程顺序写入：单进程时渲染器直接追加，多进程时工作进程把编码结果随结果交回
+        archive = ArchiveSink(args.archive)
+        renderer.sink = archive
+        renderer_options["sink"] = BufferSink()
+
+    if not font_registry.using_fallback:
+        print("✅ 已载入自定义字体 (专业级抗锯齿)")
+    else:
+        print(f"⚠️ 字体文件未找到: {font_path}")
+
+    # ========== 载入语录（流式读取，不一次性载入整个文件） ==========
+    total = count_quotes(quotes_path)
+    workers = max(1, min(workers, total))
+
+    width, height = canvas_size(args.scale)
+    if args.scale == 1:
+        print(f"🎨 开始生成专业级抗锯齿4K图片 ({width}x{height})")
+    else:
+        print(f"🔍 开始生成缩放预览图片 ({width}x{height}，缩放 {args.scale:g})")
+    print(f"🔧 抗锯齿模式: {describe_antialias()} | 文字后端: {args.text_backend}")
+    print(f"🖼️  画布模式: {args.canvas} (整帧 {width * height * len(args.canvas) / (1024 * 1024):.1f}MB)")
+    print(f"⚙️  并行进程数: {workers}")
+    print(f"💾 输出编码: {encoder.name} {encoder.options}")
+    if archive:
+        print(f"🗄️  输出归档: {archive.path} ({archive.format}，索引 {os.path.basename(archive.index_path)})")
+    if renderer.output_sizes:
+        print(f"🪜 派生尺寸: {', '.join(f'{w}x{h}' for w, h in renderer.output_sizes)}（级联缩小）")
+    for w, h in args.sizes:
+        if (w, h) not in renderer.output_sizes and (w, h) != (width, height):
+            print(f"⚠️  派生尺寸 {w}x{h} 大于画布 {width}x{height}，已忽略")
+    print(f"📝 共有 {total} 条语录待处理")
+    print("=" * 60)
+
+    failures = []
+    skipped_rows = []
+    rendered = 0
+    total_bytes = 0
+    total_encode_seconds = 0.0
+    peak_bytes = []
+
+    def report_bad_row(error):
+        skipped_rows.append(error)
+        print(f"⚠️  跳过格式错误的语录: {error}")
+
+    # 构建清单：全量模式也会更新，供下一次增量构建使用。归档模式不读写输出目录的清单和任务日志：
+    # 卡片不在 output/ 下，记下指纹会让之后的 --incremental 把目录里的旧文件当成最新的
+    manifest_dir = None if archive else output_dir
+    manifest = BuildManifest.for_output_dir(manifest_dir, render_signature(encoder, args.scale, args.canvas), args.scale)
+    skipped = {}
+    render_reasons = {}
+
+    # 任务日志：每完成一张追加一行；正常跑完后删除，中断后 --resume 据此跳过已完成的语录
+    journal = JobJournal.for_output_dir(manifest_dir, args.scale)
+    if args.resume:
+        if journal.load():
+            print(f"⏩ 断点续跑: 任务日志中已完成 {len(journal.entries)} 条")
+        else:
+            print("⏩ 没有找到未完成的任务日志，从头开始")
+    journal.start(resume=args.resume)
+
+    # SIGINT/SIGTERM：第一次停止派发新任务，已提交但还没开始的任务也放弃，进行中的卡片完成并记录后退出；
+    # 再次收到时立即中止
+    stop = {"signum": None}
+    stop_event = None
+
+    def request_stop(signum, frame):
+        if stop["signum"] is not None:
+            raise KeyboardInterrupt
+        stop["signum"] = signum
+        if stop_event is not None:
+            stop_event.set()
+        print(f"\n⏸️  收到 {signal.Signals(signum).name}，完成进行中的卡片后停止（再次发送立即中止）")
+
+    previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+    def plan_tasks():
+        for idx, row in enumerate(iter_quotes(quotes_path, on_error=report_bad_row), 1):
+            if stop["signum"] is not None:
+                return
+            output_paths = renderer.output_paths(row['id'])
+            needs_render, reason, fingerprint = manifest.check(row, output_paths)
+            if args.resume and journal.completed(row['id'], fingerprint, output_paths):
+                manifest.record(row['id'], fingerprint, output_paths[0])
+                skipped.setdefault(REASON_RESUMED, []).append(row['id'])
+                continue
+            if args.incremental and not needs_render:
+                skipped.setdefault(reason, []).append(row['id'])
+                continue
+            render_reasons[reason] = render_reasons.get(reason, 0) + 1
+            yield idx, row, fingerprint
+
+    tasks = plan_tasks()
+    worker_font_stats = {}
+    worker_mask_stats = {}
+    worker_atlas_stats = {}
+    start_time = time.perf_counter()
+
+    trace_log = TraceLog(args.trace_file) if args.profile else None
+
+    pool = None
+    pool_closed = False
+    cancelled = 0
+    abort_event = None
+    if workers == 1:
+        # 单进程模式下资源在第一条需要渲染的语录到来时才载入
+        global _worker_renderer, _worker_profile
+        _worker_renderer = renderer
+        _worker_profile = args.profile
+        results = map(_render_task, tasks)
+    else:
+        abort_event = multiprocessing.Event()
+        stop_event = multiprocessing.Event()
+        pool = multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                    initargs=(encoder, args.profile, renderer_options, abort_event, stop_event))
+        # 滑动窗口提交，按提交顺序返回结果：进度输出保持有序，内存占用不随文件大小增长
+        results = _imap_windowed(pool, _render_task, tasks, window=workers * 4)
+
+    try:
+        for result in results:
+            if result.get("cancelled"):
+                cancelled += 1
+                continue
+            print(f"🔄 处理第 {result['idx']}/{total} 条语录: ID {result['id']}")
+            for line in result["logs"]:
+                print(line)
+            if result["error"]:
+                failures.append(result["id"])
+                manifest.forget(result["id"])
+                print(f"❌ 生成失败: ID {result['id']} - {result['error']}")
+            else:
+                for quote_id, name, data in result["payloads"]:
+                    archive.write(quote_id, name, data)
+                file_size = result["bytes"] / (1024 * 1024)
+                peak = f" | 内存峰值 {result['peak_bytes'] / (1024 * 1024):.0f}MB" if "peak_bytes" in result else ""
+                print(f"📸 生成图片: {os.path.basename(result['filename'])} ({file_size:.1f}MB | 编码 {result['encode_seconds']:.2f}s{peak})")
+                total_bytes += result["bytes"]
+                total_encode_seconds += result["encode_seconds"]
+                for derived_file, derived_bytes, derived_seconds in result["derived"]:
+                    print(f"   🪜 {os.path.basename(derived_file)} ({derived_bytes / 1024:.0f}KB | 编码 {derived_seconds:.2f}s)")
+                    total_bytes += derived_bytes
+                    total_encode_seconds += derived_seconds
+                if "peak_bytes" in result:
+                    peak_bytes.append(result["peak_bytes"])
+                manifest.record(result["id"], result["fingerprint"], result["filename"])
+                journal.record(result["id"], result["fingerprint"],
+                               [result["filename"], *(derived[0] for derived in result["derived"])])
+                rendered += 1
+                if rendered % MANIFEST_SAVE_INTERVAL == 0:
+                    manifest.save()
+            if trace_log and "trace" in result:
+                trace_log.write(result["trace"])
+            worker_font_stats[result["pid"]] = result["font_stats"]
+            worker_mask_stats[result["pid"]] = result["mask_stats"]
+            worker_atlas_stats[result["pid"]] = result["atlas_stats"]
+        if pool:
+            pool.close()
+            pool_closed = True
+        else:
+            _worker_renderer.close()
+        if archive:
+            archive.close()
+        if stop["signum"] is None:
+            manifest.save(prune=True)
+            journal.discard()
+        else:
+            manifest.save()
+    except KeyboardInterrupt:
+        # 进行中的卡片直接丢弃：输出先写临时文件，最终文件名下不会留下半张图
+        print("\n⏹️  用户中断运行，进行中的卡片已丢弃" + ("" if archive else "；使用 --resume 继续"))
+        manifest.save()
+        sys.exit(128 + (stop["signum"] or signal.SIGINT))
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        journal.close()
+        if archive:
+            archive.abort()  # 没有正常关闭的归档保留 .partial 文件名
+        if pool:
+            if not pool_closed:
+                # 中止（再次收到信号或出错）：先让工作进程接受 SIGTERM，再由 pool.terminate 结束它们
+                abort_event.set()
+                pool.terminate()
+            pool.join()
+        if trace_log:
+            trace_log.close()
+
+    elapsed = time.perf_counter() - start_time
+    if trace_log:
+        trace_log.print_summary()
+    if worker_font_stats:
+        hits = sum(stats["hits"] for stats in worker_font_stats.values())
+        misses = sum(stats["misses"] for stats in worker_font_stats.values())
+        print(f"🔤 字体缓存: 命中 {hits} 次 | 未命中 {misses} 次 | 进程数 {len(worker_font_stats)}")
+        mask_hits = sum(stats["hits"] for stats in worker_mask_stats.values())
+        mask_misses = sum(stats["misses"] for stats in worker_mask_stats.values())
+        print(f"🅰️  文字蒙版缓存: 命中 {mask_hits} 次 | 未命中 {mask_misses} 次")
+    if args.text_backend == "atlas" and worker_atlas_stats:
+        glyph_hits = sum(stats["hits"] for stats in worker_atlas_stats.values())
+        glyph_misses = sum(stats["misses"] for stats in worker_atlas_stats.values())
+        loaded = sum(stats["loaded"] for stats in worker_atlas_stats.values())
+        print(f"🔠 字形图集: 拼贴 {glyph_hits} 次 | 新光栅化 {glyph_misses} 个字形 | 从磁盘载入 {loaded} 个图集")
+    if peak_bytes:
+        peak_bytes.sort()
+        print(f"🧠 单张渲染时的进程内存峰值: 中位数 {peak_bytes[len(peak_bytes) // 2] / (1024 * 1024):.1f}MB"
+              f" | 最大 {peak_bytes[-1] / (1024 * 1024):.1f}MB | 画布 {args.canvas}")
+    if rendered:
+        print(f"💾 共写入 {total_bytes / (1024 * 1024):.1f}MB | 编码共 {total_encode_seconds:.1f}s")
+    print(f"⏱️  总耗时 {elapsed:.1f}s | 平均 {elapsed / max(rendered + len(failures), 1):.2f}s/张")
+    if REASON_RESUMED in skipped:
+        print(f"⏩ 断点续跑: 跳过中断前已完成的 {len(skipped[REASON_RESUMED])} 条")
+    if args.incremental:
+        print(f"♻️  增量构建: 重新渲染 {rendered} 条 | 跳过 {sum(len(ids) for ids in skipped.values())} 条")
+        for reason, count in render_reasons.items():
+            print(f"   🔁 {reason}: {count} 条")
+        for reason, ids in skipped.items():
+            preview = ", ".join(str(quote_id) for quote_id in ids[:20])
+            more = f" 等 {len(ids)} 条" if len(ids) > 20 else ""
+            print(f"   ⏭️  {reason}: {preview}{more}")
+    if skipped_rows:
+        print(f"⚠️  {len(skipped_rows)} 行语录格式错误已跳过")
+    if failures:
+        print(f"⚠️  {len(failures)} 条语录生成失败: " + ", ".join(str(quote_id) for quote_id in failures))
+    if archive:
+        print(f"🗄️  归档: {archive.count} 张卡片 | {archive.bytes / (1024 * 1024):.1f}MB → {archive.path}")
+    if stop["signum"] is not None:
+        dropped = f"，放弃尚未开始的 {cancelled} 条" if cancelled else ""
+        print(f"⏸️  任务已停止：本次完成 {rendered} 条{dropped}" + ("（归档已按已完成的卡片收尾）" if archive else "，使用 --resume 继续"))
+        sys.exit(128 + stop["signum"])
+    print("✅ 专业级抗锯齿批量生成完成！输出目录：", output_dir)
 
-print("✅ 专业级抗锯齿批量生成完成！输出目录：", output_dir)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
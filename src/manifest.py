@@ -0,0 +1,188 @@
+"""
+增量构建清单：记录每条语录的内容指纹，只重新渲染有变化或缺失输出的语录；
+任务日志：逐条追加已完成的语录，进程中断后用 --resume 从断点继续
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = ".build_manifest.json"
+MANIFEST_VERSION = 1
+JOURNAL_FILENAME = ".render_journal.jsonl"
+
+# 跳过/重新渲染的原因
+REASON_NEW = "新增语录"
+REASON_CHANGED = "内容或版式有变化"
+REASON_MISSING = "输出文件缺失"
+REASON_UP_TO_DATE = "未变化"
+REASON_RESUMED = "中断前已完成"
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """计算文件的 SHA-256，文件不存在时返回 None"""
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _scaled_filename(filename, scale):
+    """4K 成品使用默认文件名；其他缩放比例各用一份，互不覆盖"""
+    if scale == 1:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_{scale:g}{extension}"
+
+
+def _stable_hash(payload):
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=list)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    """输出目录中的构建清单：{id: {fingerprint, output}}；path 为 None 时只在内存中记录，不读写文件"""
+
+    def __init__(self, path, render_signature):
+        self.path = path
+        # 版式常量、字体和图标文件哈希合成一个签名，任何一项变化都会让所有语录失效
+        self.render_signature = _stable_hash(render_signature)
+        self.entries = {}
+        self._seen = set()
+        self.load()
+
+    @classmethod
+    def for_output_dir(cls, output_dir, render_signature, scale=1.0):
+        """4K 成品使用默认清单；其他缩放比例各用一份，互不覆盖；output_dir 为 None 时不落盘"""
+        if output_dir is None:
+            return cls(None, render_signature)
+        return cls(os.path.join(output_dir, _scaled_filename(MANIFEST_FILENAME, scale)), render_signature)
+
+    def load(self):
+        """读取已有清单；文件损坏或版本不符时视为空清单"""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("entries", {})
+
+    def save(self, prune=False):
+        """原子写入清单；prune=True 时删除本次未出现的语录记录"""
+        if prune:
+            self.entries = {key: value for key, value in self.entries.items() if key in self._seen}
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, row):
+        """语录内容 + 渲染签名的指纹"""
+        return _stable_hash([self.render_signature, row["content"], row["reflection"]])
+
+    def check(self, row, output_path, fingerprint=None):
+        """判断是否需要重新渲染，返回 (需要渲染, 原因, 指纹)；output_path 可以是多个输出文件的列表"""
+        quote_id = str(row["id"])
+        fingerprint = fingerprint or self.fingerprint(row)
+        self._seen.add(quote_id)
+
+        entry = self.entries.get(quote_id)
+        if entry is None:
+            return True, REASON_NEW, fingerprint
+        if entry.get("fingerprint") != fingerprint:
+            return True, REASON_CHANGED, fingerprint
+        paths = [output_path] if isinstance(output_path, str) else output_path
+        if not all(os.path.exists(path) for path in paths):
+            return True, REASON_MISSING, fingerprint
+        return False, REASON_UP_TO_DATE, fingerprint
+
+    def record(self, quote_id, fingerprint, output_path):
+        """记录一次成功的渲染"""
+        quote_id = str(quote_id)
+        self._seen.add(quote_id)
+        self.entries[quote_id] = {
+            "fingerprint": fingerprint,
+            "output": os.path.basename(output_path),
+        }
+
+    def forget(self, quote_id):
+        """渲染失败时移除记录，保证下一次增量构建会重试"""
+        self.entries.pop(str(quote_id), None)
+
+
+class JobJournal:
+    """批量任务日志（JSON Lines）：每完成一条语录追加一行并落盘，中断时最多丢失正在写的一行
+
+    正常跑完整批后删除；日志存在即说明上一次任务没有跑完。path 为 None 时只在内存中记录，不读写文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._file = None
+
+    @classmethod
+    def for_output_dir(cls, output_dir, scale=1.0):
+        if output_dir is None:
+            return cls(None)
+        return cls(os.path.join(output_dir, _scaled_filename(JOURNAL_FILENAME, scale)))
+
+    def load(self):
+        """读取已有日志，返回记录条数；末尾写了一半的行直接忽略"""
+        self.entries = {}
+        if self.path is None:
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.entries[str(record["id"])] = record
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            pass
+        return len(self.entries)
+
+    def start(self, resume=False):
+        """开始写日志：resume=True 时在原日志后追加，否则开始一个新任务"""
+        if not resume:
+            self.entries = {}
+        if self.path is None:
+            return
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def completed(self, quote_id, fingerprint, output_paths):
+        """日志中记录的该语录是否可直接跳过（指纹一致且输出文件都在）"""
+        record = self.entries.get(str(quote_id))
+        return (record is not None and record.get("fingerprint") == fingerprint
+                and all(os.path.exists(path) for path in output_paths))
+
+    def record(self, quote_id, fingerprint, output_paths):
+        record = {"id": str(quote_id), "fingerprint": fingerprint,
+                  "outputs": [os.path.basename(path) for path in output_paths]}
+        self.entries[record["id"]] = record
+        if self._file is None:
+            return
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """整批完成：关闭并删除日志"""
+        self.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
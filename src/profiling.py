@@ -0,0 +1,145 @@
+"""
+可选的性能追踪：为单条语录渲染的各阶段计时，记录内存峰值，输出 JSON Lines 明细和批次汇总表
+"""
+
+import contextlib
+import json
+import statistics
+import time
+import tracemalloc
+
+
+# ========== 内存 ==========
+def read_status_kb(field):
+    """读取 /proc/self/status 中的内存字段（仅 Linux），不可用时返回 None"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def reset_peak_rss():
+    """重置进程的 RSS 峰值（Linux clear_refs），成功返回 True"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# ========== 单条语录 ==========
+class QuoteProfiler:
+    """记录一条语录各阶段的耗时（毫秒）和内存峰值"""
+
+    def __init__(self, quote_id, trace_memory=True):
+        self.quote_id = quote_id
+        self.trace_memory = trace_memory and tracemalloc.is_tracing()
+        self.spans = {}
+        self.metrics = {}
+        self._start = self._last_lap = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        # Pillow 的像素缓冲区不经过 tracemalloc，RSS 峰值才能反映大画布的开销
+        self._rss_tracked = reset_peak_rss()
+        self._rss_base = read_status_kb("VmRSS") if self._rss_tracked else None
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """计时一个命名阶段，同名阶段的耗时会累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def lap(self, name):
+        """把上一次 lap 到现在的耗时记为一个阶段（顺序执行的流程无需改动缩进）"""
+        now = time.perf_counter()
+        self.spans[name] = self.spans.get(name, 0.0) + (now - self._last_lap) * 1000
+        self._last_lap = now
+
+    def add_span(self, name, elapsed_ms):
+        """补记一个在别处测得的阶段耗时"""
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def note_max(self, name, value):
+        """记录一个取最大值的指标（如最大的超采样画布像素数）"""
+        self.metrics[name] = max(self.metrics.get(name, value), value)
+
+    def to_record(self):
+        """导出为可写入 JSON Lines 的字典"""
+        record = {
+            "id": self.quote_id,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "spans_ms": {name: round(value, 3) for name, value in self.spans.items()},
+        }
+        if self.metrics:
+            record["metrics"] = self.metrics
+        if self.trace_memory:
+            record["traced_peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        if self._rss_tracked:
+            peak = read_status_kb("VmHWM")
+            if peak is not None and self._rss_base is not None:
+                record["rss_peak_delta_kb"] = max(0, peak - self._rss_base)
+        return record
+
+
+class _NullProfiler:
+    """关闭追踪时使用的空实现，开销可以忽略"""
+
+    def span(self, name):
+        return contextlib.nullcontext()
+
+    def lap(self, name):
+        pass
+
+    def add_span(self, name, elapsed_ms):
+        pass
+
+    def note_max(self, name, value):
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+# ========== 批次 ==========
+class TraceLog:
+    """把每条语录的追踪记录写入 JSON Lines，并在批次结束时打印汇总表"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+        self._durations = {}
+        self._slowest = {}
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stages = dict(record["spans_ms"], total=record["total_ms"])
+        for name, value in stages.items():
+            self._durations.setdefault(name, []).append(value)
+            if value > self._slowest.get(name, (None, -1.0))[1]:
+                self._slowest[name] = (record["id"], value)
+
+    def close(self):
+        self._file.close()
+
+    def print_summary(self):
+        """打印各阶段的次数、中位数、p95、最大值及最慢语录"""
+        if not self._durations:
+            return
+        print(f"{'阶段':<14}{'次数':>6}{'中位数(ms)':>12}{'p95(ms)':>12}{'最大(ms)':>12}  最慢语录")
+        print("-" * 72)
+        for name, values in self._durations.items():
+            ordered = sorted(values)
+            p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+            slowest_id = self._slowest[name][0]
+            print(f"{name:<14}{len(values):>6}{statistics.median(values):>12.1f}{p95:>12.1f}"
+                  f"{ordered[-1]:>12.1f}  ID {slowest_id}")
+        print(f"🧾 追踪明细: {self.path}")
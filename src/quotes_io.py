@@ -0,0 +1,64 @@
+"""
+语录数据流式读取：逐行产出 CSV 记录，内存占用与文件大小无关，不依赖 pandas
+"""
+
+import csv
+
+# quotes.csv 必须包含的列
+REQUIRED_COLUMNS = ("id", "content", "reflection")
+
+
+class QuoteFormatError(ValueError):
+    """语录文件格式错误（缺列、字段缺失等）"""
+
+
+def _open_quotes(quotes_path):
+    # utf-8-sig 自动去掉 Excel 导出时附带的 BOM；newline="" 让 csv 模块正确处理引号内换行
+    return open(quotes_path, "r", encoding="utf-8-sig", newline="")
+
+
+def _check_header(fieldnames, quotes_path):
+    if fieldnames is None:
+        raise QuoteFormatError(f"语录文件为空: {quotes_path}")
+    header = [name.strip() for name in fieldnames]
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise QuoteFormatError(f"语录文件缺少必要列 {missing}: {quotes_path}")
+    return header
+
+
+def iter_quotes(quotes_path, on_error=None):
+    """逐条产出语录字典 {id, content, reflection}
+
+    字段缺失的行默认抛出 QuoteFormatError；传入 on_error 时改为回调该异常并跳过此行。
+    """
+    with _open_quotes(quotes_path) as f:
+        reader = csv.reader(f)
+        header = _check_header(next(reader, None), quotes_path)
+        indexes = {col: header.index(col) for col in REQUIRED_COLUMNS}
+
+        for record in reader:
+            if not record:
+                continue  # 跳过空行
+
+            try:
+                values = {col: record[i] for col, i in indexes.items()}
+            except IndexError:
+                values = None
+            if values is None or not values["id"].strip() or not values["content"].strip():
+                error = QuoteFormatError(f"第 {reader.line_num} 行字段缺失: {quotes_path}")
+                if on_error is None:
+                    raise error
+                on_error(error)
+                continue
+
+            values["id"] = values["id"].strip()
+            yield values
+
+
+def count_quotes(quotes_path):
+    """统计语录条数（流式扫描一遍，用于进度显示）"""
+    with _open_quotes(quotes_path) as f:
+        reader = csv.reader(f)
+        _check_header(next(reader, None), quotes_path)
+        return sum(1 for record in reader if record)
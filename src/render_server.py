@@ -0,0 +1,344 @@
+"""
+常驻本地渲染服务：进程池中的渲染器常驻字体、解码后的图标和静态模板层，
+通过本地 HTTP 或 Unix socket 接收语录并返回编码后的图片字节
+
+用法:
+    python render_server.py                              # 监听 127.0.0.1:8765
+    python render_server.py --workers 4 --preset web
+    python render_server.py --unix-socket /tmp/card.sock
+
+接口:
+    POST /render   JSON {"content": "...", "reflection": "...", "id": 可选}  -> 图片字节
+    GET  /health   存活检查
+    GET  /stats    队列、延迟和各进程缓存统计
+"""
+
+import argparse
+import collections
+import http.server
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import signal
+import socket
+import socketserver
+import statistics
+import threading
+import time
+
+from antialias import ANTIALIAS_MODES, AUTO_MODE
+from encoders import DEFAULT_PRESET, ENCODER_FACTORIES, PRESETS, get_encoder
+import main_antialiasing as card
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 32        # 排队 + 渲染中的请求上限，超出直接返回 503
+DEFAULT_TIMEOUT = 60.0         # 单个请求等待结果的最长秒数
+MAX_BODY_BYTES = 64 * 1024     # 语录正文足够小，拒绝异常大的请求体
+LATENCY_WINDOW = 1000          # 延迟统计保留最近多少个请求
+
+CONTENT_TYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+
+class PayloadError(ValueError):
+    """请求体不是合法的语录"""
+
+
+def parse_payload(body):
+    """校验请求体，返回语录字典"""
+    try:
+        payload = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise PayloadError(f"请求体不是合法的 JSON: {e}") from e
+    if not isinstance(payload, dict):
+        raise PayloadError("请求体必须是 JSON 对象")
+    quote = {}
+    for field in ("content", "reflection"):
+        value = payload.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise PayloadError(f"缺少字段或为空: {field}")
+        quote[field] = value
+    quote["id"] = str(payload.get("id", "request"))
+    return quote
+
+
+# ========== 工作进程 ==========
+_server_renderer = None
+
+
+def _init_server_worker(encoder, renderer_options):
+    """工作进程启动时即载入资源，第一个请求不承担冷启动"""
+    global _server_renderer
+    # Ctrl+C 由主进程处理（关闭服务后 pool.close 收尾），工作进程不各自抛出 KeyboardInterrupt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _server_renderer = card.CardRenderer(encoder, **renderer_options).warm_up()
+    # 服务关闭（pool.close）时保存本进程新增的字形
+    multiprocessing.util.Finalize(_server_renderer, _server_renderer.close, exitpriority=10)
+
+
+def _render_payload(quote):
+    """渲染并编码一条语录，返回 (字节串, 渲染毫秒, 编码毫秒, 进程号, 缓存统计)"""
+    start = time.perf_counter()
+    canvas = _server_renderer.render(quote)
+    render_ms = (time.perf_counter() - start) * 1000
+    data, encode_seconds = _server_renderer.encode(canvas)
+    return data, render_ms, encode_seconds * 1000, os.getpid(), _server_renderer.stats()
+
+
+# ========== 服务 ==========
+class RenderService:
+    """进程池 + 有界准入队列 + 统计"""
+
+    def __init__(self, workers=1, queue_size=DEFAULT_QUEUE_SIZE, timeout=DEFAULT_TIMEOUT,
+                 encoder=None, renderer_options=None):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.encoder = encoder or get_encoder()
+        self.started = time.time()
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._worker_stats = {}
+        self.counters = {"accepted": 0, "completed": 0, "failed": 0, "rejected": 0, "in_flight": 0}
+        self.pool = multiprocessing.Pool(processes=self.workers, initializer=_init_server_worker,
+                                         initargs=(self.encoder, renderer_options or {}))
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES.get(self.encoder.image_format, "application/octet-stream")
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.counters[name] += delta
+
+    def submit(self, quote):
+        """渲染一条语录；队列已满时返回 None（调用方应回复 503）"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            return None
+        start = time.perf_counter()
+        self._count("accepted")
+        self._count("in_flight")
+
+        def release(_):
+            # 名额在进程池里的任务真正结束时才归还：请求超时后任务仍在渲染，照样占着队列
+            self._count("in_flight", -1)
+            self._slots.release()
+
+        try:
+            pending = self.pool.apply_async(_render_payload, (quote,), callback=release, error_callback=release)
+        except Exception:
+            release(None)
+            self._count("failed")
+            raise
+        try:
+            data, render_ms, encode_ms, pid, stats = pending.get(self.timeout)
+        except Exception:
+            self._count("failed")
+            raise
+
+        total_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.counters["completed"] += 1
+            self._latencies.append(total_ms)
+            self._worker_stats[pid] = stats
+        return {"data": data, "render_ms": render_ms, "encode_ms": encode_ms, "total_ms": total_ms}
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            result = {
+                "uptime_s": round(time.time() - self.started, 1),
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "encoder": self.encoder.describe(),
+                "counters": dict(self.counters),
+                "worker_caches": {str(pid): stats for pid, stats in self._worker_stats.items()},
+            }
+        if latencies:
+            result["latency_ms"] = {
+                "median": round(statistics.median(latencies), 1),
+                "p95": round(latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))], 1),
+                "max": round(latencies[-1], 1),
+                "window": len(latencies),
+            }
+        return result
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "CardRenderServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix socket 的客户端地址不是 (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._send_json(404, {"error": "未知路径"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {"error": "Content-Length 无效"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": f"请求体超过 {MAX_BODY_BYTES} 字节"})
+            return
+        try:
+            quote = parse_payload(self.rfile.read(length))
+        except PayloadError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            result = self.service.submit(quote)
+        except multiprocessing.TimeoutError:
+            self._send_json(504, {"error": f"渲染超时（{self.service.timeout}s）"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        if result is None:
+            self._send_json(503, {"error": "渲染队列已满"}, headers={"Retry-After": "1"})
+            return
+
+        self._send(200, result["data"], self.service.content_type, headers={
+            "X-Render-Ms": f"{result['render_ms']:.1f}",
+            "X-Encode-Ms": f"{result['encode_ms']:.1f}",
+            "X-Total-Ms": f"{result['total_ms']:.1f}",
+        })
+
+
+class CardHTTPServer(http.server.ThreadingHTTPServer):
+    def __init__(self, address, service, quiet=False):
+        self.service = service
+        self.quiet = quiet
+        super().__init__(address, RenderRequestHandler)
+
+
+class CardUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service, quiet=False):
+        self.service = service
+        self.quiet = quiet
+        if os.path.exists(path):
+            os.unlink(path)  # 清理上次异常退出残留的 socket 文件
+        super().__init__(path, RenderRequestHandler)
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None, quiet=False):
+    """按参数创建 TCP 或 Unix socket 服务"""
+    if unix_socket:
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("当前平台不支持 Unix socket，请改用 --host/--port")
+        return CardUnixHTTPServer(unix_socket, service, quiet)
+    return CardHTTPServer((host, port), service, quiet)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="常驻本地渲染服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址（默认 {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument("--unix-socket", help="改为监听 Unix socket 文件")
+    parser.add_argument("--workers", type=int, default=1, help="渲染进程数（0表示使用全部CPU核心）")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"排队与渲染中的请求上限，超出返回 503（默认 {DEFAULT_QUEUE_SIZE}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个请求的超时秒数")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=DEFAULT_PRESET, help="输出预设")
+    parser.add_argument("--encoder", choices=sorted(ENCODER_FACTORIES), help="直接指定编码器，覆盖预设")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP 质量 (1-100)")
+    parser.add_argument("--compress-level", type=int, choices=range(10), metavar="0-9", help="PNG zlib 压缩级别")
+    parser.add_argument("--antialias", choices=[*ANTIALIAS_MODES, AUTO_MODE], default=card.ANTIALIAS_MODE,
+                        help="文字抗锯齿模式")
+    parser.add_argument("--aa-threshold", type=float, default=card.AA_QUALITY_THRESHOLD,
+                        help="auto 模式的覆盖率误差阈值（%%）")
+    parser.add_argument("--text-backend", choices=card.TEXT_BACKENDS, default=card.TEXT_BACKEND,
+                        help="文字光栅化后端（atlas 使用持久化字形图集）")
+    parser.add_argument("--scale", type=float, default=card.LAYOUT_SCALE, help="排版缩放比例（默认1.0为4K）")
+    parser.add_argument("--preview", action="store_const", const=card.PREVIEW_SCALE, dest="scale",
+                        help=f"返回快速预览图（等同于 --scale {card.PREVIEW_SCALE}）")
+    parser.add_argument("--canvas", choices=card.CANVAS_MODES, default=card.CANVAS_MODE,
+                        help="画布模式（RGB 为省内存模式）")
+    parser.add_argument("--quiet", action="store_true", help="不打印每个请求的访问日志")
+    args = parser.parse_args(argv)
+    if not 0 < args.scale <= 1:
+        parser.error(f"--scale 必须在 (0, 1] 范围内（1 为 4K 成品），当前为 {args.scale:g}")
+    if args.workers < 0:
+        parser.error("--workers 不能为负数（0 表示使用全部CPU核心）")
+    if args.queue_size < 1:
+        parser.error("--queue-size 至少为 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    encoder = get_encoder(args.encoder, args.preset, args.quality, args.compress_level)
+
+    renderer_options = {"antialias": args.antialias, "aa_threshold": args.aa_threshold, "scale": args.scale,
+                        "canvas_mode": args.canvas, "text_backend": args.text_backend}
+    service = RenderService(workers, args.queue_size, args.timeout, encoder, renderer_options)
+    server = create_server(service, args.host, args.port, args.unix_socket, args.quiet)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"🚀 渲染服务已启动: {where}")
+    print(f"⚙️  渲染进程数: {service.workers} | 队列上限: {args.queue_size} | 输出编码: {encoder.name} {encoder.options}")
+
+    def stop(signum, frame):
+        # shutdown 会等待 serve_forever 退出，必须在另一个线程中调用
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n⏹️  渲染服务停止")
+        server.server_close()
+        service.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
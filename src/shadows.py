@@ -0,0 +1,71 @@
+"""
+柔和投影：按素材的 alpha 形状（或文字覆盖率蒙版）做一次高斯模糊生成投影贴图，
+按 (来源, 模糊半径, 颜色/透明度) 缓存，之后每张卡片的投影只需一次粘贴
+"""
+
+from collections import OrderedDict
+
+from PIL import Image, ImageFilter
+
+from text_masks import colorize_mask
+
+# 高斯模糊的影响范围约为 3 倍半径，贴图四周留出同样宽度，避免模糊边缘被截断
+SHADOW_SPREAD = 3
+# 图标、主题词投影的种类有限（每个缩放比例几个图标 + 每个主题词一个）
+SHADOW_CACHE_SIZE = 64
+
+
+def shadow_sprite(alpha, radius, color):
+    """由 L 形状蒙版生成模糊投影贴图，返回 (RGBA 贴图, 四周外扩像素)"""
+    pad = radius * SHADOW_SPREAD
+    if radius <= 0:
+        return colorize_mask(alpha, color), 0
+    expanded = Image.new("L", (alpha.width + pad * 2, alpha.height + pad * 2), 0)
+    expanded.paste(alpha, (pad, pad))
+    return colorize_mask(expanded.filter(ImageFilter.GaussianBlur(radius)), color), pad
+
+
+def alpha_of(image):
+    """素材的形状蒙版：带透明通道时取 alpha，否则整块不透明"""
+    if "A" in image.getbands():
+        return image.getchannel("A")
+    return Image.new("L", image.size, 255)
+
+
+class ShadowCache:
+    """按 (来源, 模糊半径, 颜色) 缓存投影贴图的 LRU，记录命中/未命中次数"""
+
+    def __init__(self, max_entries=SHADOW_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def get(self, source_key, alpha, radius, color):
+        """返回 (贴图, 外扩像素)；alpha 可以是蒙版或返回蒙版的函数（命中缓存时不会调用）"""
+        key = (source_key, radius, tuple(color))
+        entry = self._cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = self._cache[key] = shadow_sprite(alpha() if callable(alpha) else alpha, radius, color)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return entry
+
+    def paste(self, canvas, source_key, alpha, radius, color, xy):
+        """把投影贴到 canvas 上：xy 为投影形状（未外扩）的左上角"""
+        sprite, pad = self.get(source_key, alpha, radius, color)
+        canvas.paste(sprite, (xy[0] - pad, xy[1] - pad), sprite)
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"entries": len(self._cache), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,201 @@
+"""
+输出去向：默认每张卡片一个文件（先写临时文件再原子改名）；归档模式把编码好的卡片依次追加到
+单个 tar 或 ZIP（存储模式，不再压缩）中，同时为每张卡片记录 (id, 成员名, 数据偏移, 字节数, 哈希) 索引，
+按索引直接 seek 读出单张卡片，无需扫描整个归档
+
+用法:
+    python sinks.py output/cards.tar --list              # 列出归档索引
+    python sinks.py output/cards.tar 17 --output out/    # 取出 ID 17 的全部卡片（主图和派生尺寸）
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+PARTIAL_SUFFIX = ".partial"
+INDEX_SUFFIX = ".index.jsonl"
+ARCHIVE_FORMATS = {".tar": "tar", ".zip": "zip"}
+
+
+class ArchiveIntegrityError(ValueError):
+    """归档中的卡片与索引记录的哈希不符"""
+
+
+def archive_format(path):
+    """按扩展名判断归档格式，不支持时返回 None"""
+    return ARCHIVE_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+class DirectorySink:
+    """每张卡片一个文件：写临时文件并落盘后原子改名，中断或掉电时最终文件名下不会出现写了一半的图片"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, quote_id, name, data):
+        """写入一张卡片，返回文件路径"""
+        path = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}{PARTIAL_SUFFIX}"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                # 先落盘再改名：掉电后最终文件名下不会是空文件或截断的图片，续跑时可以放心跳过
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def drain(self):
+        return []
+
+
+class BufferSink:
+    """多进程归档模式的工作进程端：编码结果暂存在内存，随渲染结果交给主进程写入归档"""
+
+    def __init__(self):
+        self._payloads = []
+
+    def write(self, quote_id, name, data):
+        self._payloads.append((quote_id, name, data))
+        return name
+
+    def drain(self):
+        """取出并清空暂存的 [(语录ID, 成员名, 字节串)]"""
+        payloads, self._payloads = self._payloads, []
+        return payloads
+
+
+class ArchiveSink:
+    """流式归档：卡片按产出顺序追加到单个 tar / ZIP_STORED 文件，索引逐行追加（JSON Lines）
+
+    写入过程中使用 .partial 文件名，close() 后才改名为最终文件；中途中止（abort）时保留 .partial。
+    索引中的 offset 指向成员数据本身（跳过 tar/zip 头），size 字节即为完整的图片文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.format = archive_format(path)
+        if self.format is None:
+            raise ValueError(f"不支持的归档格式: {path}（可选: {', '.join(ARCHIVE_FORMATS)}）")
+        self.count = 0
+        self.bytes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path + PARTIAL_SUFFIX, "wb")
+        self._index = open(self.index_path + PARTIAL_SUFFIX, "w", encoding="utf-8")
+        if self.format == "tar":
+            self._archive = tarfile.open(fileobj=self._file, mode="w", format=tarfile.PAX_FORMAT)
+        else:
+            self._archive = zipfile.ZipFile(self._file, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, quote_id, name, data):
+        """追加一张卡片并记录索引，返回 归档路径/成员名"""
+        if self.format == "tar":
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.time()
+            info.mode = 0o644
+            self._archive.addfile(info, io.BytesIO(data))
+            # 成员数据按 512 字节块补齐，当前位置减去补齐后的长度即为数据起点
+            offset = self._file.tell() - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        else:
+            self._archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+            offset = self._file.tell() - len(data)
+        entry = {"id": str(quote_id), "name": name, "offset": offset, "size": len(data),
+                 "sha256": hashlib.sha256(data).hexdigest()}
+        self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._index.flush()
+        self.count += 1
+        self.bytes += len(data)
+        return os.path.join(self.path, name)
+
+    def drain(self):
+        return []
+
+    def close(self):
+        """写完归档尾部并改为最终文件名；重复调用无副作用"""
+        if self._file is None:
+            return
+        self._archive.close()
+        self._file.close()
+        self._index.close()
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+        os.replace(self.index_path + PARTIAL_SUFFIX, self.index_path)
+        self._file = None
+
+    def abort(self):
+        """中途中止：关闭文件但保留 .partial，不当作完整归档；已 close 时无副作用"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._index.close()
+        self._file = None
+
+
+def load_index(archive_path):
+    """读取归档索引，返回 {语录ID: [条目, ...]}（同一 ID 的主图和派生尺寸按写入顺序排列）"""
+    entries = {}
+    with open(archive_path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.setdefault(entry["id"], []).append(entry)
+    return entries
+
+
+def read_card(archive_path, entry, verify=True):
+    """按索引条目直接读取一张卡片的字节串"""
+    with open(archive_path, "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["size"])
+    if verify and hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ArchiveIntegrityError(f"{entry['name']} 的哈希与索引不符: {archive_path}")
+    return data
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="按索引从卡片归档中取出单张卡片")
+    parser.add_argument("archive", help="归档路径（.tar 或 .zip，旁边需有同名 .index.jsonl 索引）")
+    parser.add_argument("ids", nargs="*", help="要取出的语录 ID")
+    parser.add_argument("--list", action="store_true", help="列出索引中的全部卡片")
+    parser.add_argument("--output", default=".", help="取出的卡片写入的目录（默认当前目录）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    index = load_index(args.archive)
+    if args.list or not args.ids:
+        for quote_id, entries in index.items():
+            for entry in entries:
+                print(f"{quote_id}\t{entry['name']}\t{entry['size'] / (1024 * 1024):.1f}MB\t@{entry['offset']}")
+        print(f"🗄️  共 {sum(len(entries) for entries in index.values())} 张卡片 | {len(index)} 条语录", file=sys.stderr)
+        return
+
+    sink = DirectorySink(args.output)
+    missing = []
+    for quote_id in args.ids:
+        if quote_id not in index:
+            missing.append(quote_id)
+            continue
+        for entry in index[quote_id]:
+            path = sink.write(quote_id, entry["name"], read_card(args.archive, entry))
+            print(f"📤 {path}")
+    if missing:
+        print(f"⚠️  归档中没有这些语录: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
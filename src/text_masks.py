@@ -0,0 +1,78 @@
+"""
+文字覆盖率蒙版缓存：文字只光栅化一次为单通道蒙版，颜色和透明度在合成时再上色
+"""
+
+from collections import OrderedDict
+
+from PIL import Image
+
+# 主题词、品牌标题这类短文本会反复命中；长正文只占用少量预算后被淘汰
+TEXT_MASK_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class TextMaskCache:
+    """按字节预算做 LRU 淘汰的蒙版缓存，记录命中/未命中次数"""
+
+    def __init__(self, max_bytes=TEXT_MASK_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def get(self, key):
+        """查询蒙版，未缓存时返回 None"""
+        mask = self._cache.get(key)
+        if mask is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return mask
+
+    def put(self, key, mask):
+        """写入蒙版，超出预算时淘汰最久未使用的条目"""
+        size = mask.width * mask.height
+        if size > self.max_bytes:
+            return
+        if key in self._cache:
+            self.current_bytes -= self._size_of(self._cache.pop(key))
+        self._cache[key] = mask
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.current_bytes -= self._size_of(evicted)
+
+    @staticmethod
+    def _size_of(mask):
+        return mask.width * mask.height
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._cache.clear()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        return {
+            "entries": len(self._cache),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def colorize_mask(mask, color):
+    """把 L 蒙版上色为 RGBA 图像，颜色自带的透明度乘到蒙版上"""
+    rgb = tuple(color[:3])
+    alpha = color[3] if len(color) > 3 else 255
+
+    if alpha < 255:
+        mask = mask.point(lambda v: (v * alpha + 127) // 255)
+
+    img = Image.new("RGBA", mask.size, rgb + (0,))
+    img.putalpha(mask)
+    return img
@@ -0,0 +1,208 @@
+"""
+主题分类：从关键词文件一次性构建 Aho-Corasick 多模式匹配自动机，单次扫描文本即可找出全部关键词，
+按得分选出最佳主题（同分时按关键词文件中的主题顺序），支持整份 CSV 的批量分类
+
+用法:
+    python themes.py                                   # 分类 resources/quotes.csv 并打印结果
+    python themes.py quotes.csv --output themes.csv    # 批量分类并写入 CSV
+"""
+
+import argparse
+import collections
+import csv
+import os
+import sys
+
+from quotes_io import iter_quotes
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_KEYWORDS_PATH = os.path.join(project_root, "resources", "theme_keywords.csv")
+DEFAULT_QUOTES_PATH = os.path.join(project_root, "resources", "quotes.csv")
+KEYWORD_COLUMNS = ("theme", "keyword")
+DEFAULT_WEIGHT = 1.0
+
+# 没有命中任何关键词时的兜底主题
+FALLBACK_THEME = "心理洞察"
+
+ThemeMatch = collections.namedtuple("ThemeMatch", "start end keyword theme")
+ThemeResult = collections.namedtuple("ThemeResult", "theme score scores matches")
+
+
+class KeywordFormatError(ValueError):
+    """关键词文件格式错误"""
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机：构建一次，之后每段文本只需扫描一遍"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]      # 状态 -> {字符: 下一状态}
+        self._fail = [0]
+        self._output = [[]]    # 状态 -> 在此结束的模式编号
+        self.patterns = []
+        for pattern in patterns:
+            self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(len(self.patterns))
+        self.patterns.append(pattern)
+
+    def _build_failure_links(self):
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                # 合并失败链上的输出，匹配时无需再沿失败链回溯
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """逐个产出 (结束位置, 模式编号)，结束位置不含"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in output[state]:
+                yield index + 1, pattern_id
+
+
+def load_keywords(path=DEFAULT_KEYWORDS_PATH):
+    """读取关键词文件（theme,keyword[,weight]），返回按文件顺序排列的 {主题: [(关键词, 权重)]}"""
+    themes = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [col for col in KEYWORD_COLUMNS if col not in header]
+        if missing:
+            raise KeywordFormatError(f"关键词文件缺少必要列 {missing}: {path}")
+        theme_index, keyword_index = header.index("theme"), header.index("keyword")
+        weight_index = header.index("weight") if "weight" in header else None
+
+        for record in reader:
+            if not record:
+                continue
+            try:
+                theme, keyword = record[theme_index].strip(), record[keyword_index].strip()
+                weight = DEFAULT_WEIGHT
+                if weight_index is not None and weight_index < len(record) and record[weight_index].strip():
+                    weight = float(record[weight_index])
+            except (IndexError, ValueError) as e:
+                raise KeywordFormatError(f"第 {reader.line_num} 行格式错误: {path}") from e
+            if theme and keyword:
+                themes.setdefault(theme, []).append((keyword, weight))
+    return themes
+
+
+def fallback_theme(text):
+    """没有命中关键词时的兜底规则"""
+    if '你' in text and ('自己' in text or '内心' in text):
+        return '自我对话'
+    elif '生活' in text or '人生' in text:
+        return '生活感悟'
+    elif '身体' in text or '呼吸' in text:
+        return '身心合一'
+    return FALLBACK_THEME
+
+
+class ThemeClassifier:
+    """基于关键词的主题分类器
+
+    每次命中计 权重 × 关键词长度 分（越长的关键词越具体），得分最高的主题胜出；
+    同分时取关键词文件中靠前的主题，结果与文本中关键词出现的先后无关。
+    """
+
+    def __init__(self, keywords):
+        self.themes = list(keywords)
+        self._priority = {theme: rank for rank, theme in enumerate(self.themes)}
+        # 同一关键词可以属于多个主题
+        entries = {}
+        for theme, items in keywords.items():
+            for keyword, weight in items:
+                entries.setdefault(keyword, []).append((theme, weight))
+        self._entries = [entries[keyword] for keyword in entries]
+        self.automaton = AhoCorasick(entries)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_KEYWORDS_PATH):
+        return cls(load_keywords(path))
+
+    def find(self, text):
+        """返回全部关键词命中（按结束位置排列）"""
+        return self.classify(text).matches
+
+    def classify(self, text):
+        """单次扫描文本，返回 ThemeResult(主题, 得分, 各主题得分, 命中列表)"""
+        scores = {}
+        matches = []
+        for end, pattern_id in self.automaton.iter_matches(text):
+            keyword = self.automaton.patterns[pattern_id]
+            for theme, weight in self._entries[pattern_id]:
+                scores[theme] = scores.get(theme, 0.0) + weight * len(keyword)
+                matches.append(ThemeMatch(end - len(keyword), end, keyword, theme))
+        if not scores:
+            return ThemeResult(fallback_theme(text), 0.0, scores, matches)
+        best = min(scores, key=lambda theme: (-scores[theme], self._priority[theme]))
+        return ThemeResult(best, scores[best], scores, matches)
+
+    def classify_many(self, texts):
+        """批量分类，逐条产出结果"""
+        for text in texts:
+            yield self.classify(text)
+
+    def classify_quotes(self, quotes_path, on_error=None):
+        """流式分类整份语录 CSV，逐条产出 (语录, 结果)"""
+        for row in iter_quotes(quotes_path, on_error=on_error):
+            yield row, self.classify(row["content"].strip())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="按关键词批量分类语录主题")
+    parser.add_argument("quotes", nargs="?", default=DEFAULT_QUOTES_PATH, help="语录 CSV（默认 resources/quotes.csv）")
+    parser.add_argument("--keywords", default=DEFAULT_KEYWORDS_PATH, help="关键词文件 theme,keyword[,weight]")
+    parser.add_argument("--output", help="写入结果 CSV（id,theme,score,matches）；缺省时打印到终端")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    classifier = ThemeClassifier.from_file(args.keywords)
+    print(f"🏷️  主题 {len(classifier.themes)} 个 | 关键词 {len(classifier.automaton.patterns)} 个", file=sys.stderr)
+
+    out = open(args.output, "w", encoding="utf-8-sig", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["id", "theme", "score", "matches"])
+        counts = collections.Counter()
+        for row, result in classifier.classify_quotes(args.quotes, on_error=lambda e: print(f"⚠️  {e}", file=sys.stderr)):
+            counts[result.theme] += 1
+            matches = " ".join(f"{m.keyword}@{m.start}" for m in result.matches)
+            writer.writerow([row["id"], result.theme, f"{result.score:g}", matches])
+    finally:
+        if args.output:
+            out.close()
+
+    for theme, count in counts.most_common():
+        print(f"   {theme}: {count} 条", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+像素等价校验：用当前流水线渲染一组参考图，保存逐张的像素哈希和缩小的参考缩略图；
+之后的运行与参考逐张比较（完全一致，或缩略图在容差内），有偏差的语录输出对比图
+"""
+
+import collections
+import hashlib
+import json
+import os
+
+from PIL import Image, ImageChops, ImageStat
+
+REFERENCE_FORMAT_VERSION = 1
+INDEX_FILENAME = "reference.json"
+# 缩略图宽度（4K 的 1/4）：亚像素级抖动在缩小后基本被平均掉，肉眼可见的变化仍然保留
+THUMBNAIL_WIDTH = 540
+# 对比图中差异放大的倍数
+DIFF_AMPLIFY = 8
+
+STATUS_IDENTICAL = "identical"
+STATUS_WITHIN_TOLERANCE = "within_tolerance"
+STATUS_DRIFT = "drift"
+STATUS_MISSING = "missing"    # 参考集中没有这条语录
+STATUS_STALE = "stale"        # 语录内容已变，参考图不再适用
+
+PASSING_STATUSES = (STATUS_IDENTICAL, STATUS_WITHIN_TOLERANCE)
+
+VerifyResult = collections.namedtuple("VerifyResult", "quote_id status mean_diff max_diff diff_path")
+
+
+def frame_hash(image):
+    """画布像素的哈希（含模式和尺寸），与输出编码无关"""
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def content_hash(row):
+    return hashlib.sha256(json.dumps([row["content"], row["reflection"]], ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def make_thumbnail(image):
+    """RGB 参考缩略图；画布本身不大于缩略图时保持原尺寸"""
+    image = image.convert("RGB")
+    if image.width <= THUMBNAIL_WIDTH:
+        return image
+    height = round(image.height * THUMBNAIL_WIDTH / image.width)
+    return image.resize((THUMBNAIL_WIDTH, height), Image.Resampling.LANCZOS)
+
+
+def image_difference(reference, current):
+    """返回 (平均差异, 最大差异, 差异图)，差异按 0-255 的通道值计"""
+    diff = ImageChops.difference(reference, current)
+    mean = sum(ImageStat.Stat(diff).mean) / len(diff.getbands())
+    maximum = max(high for _, high in diff.getextrema())
+    return mean, maximum, diff
+
+
+class ReferenceSet:
+    """参考集目录：reference.json 记录哈希和渲染签名，thumbnails/ 存缩略图，diffs/ 存对比图"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.signature = None
+        self.entries = {}
+
+    def load(self):
+        """读取参考集，不存在或版本不符时返回 False"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != REFERENCE_FORMAT_VERSION:
+            return False
+        self.signature = data.get("signature")
+        self.entries = data.get("entries", {})
+        return True
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": REFERENCE_FORMAT_VERSION, "signature": self.signature, "entries": self.entries},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _thumbnail_path(self, quote_id):
+        return os.path.join(self.directory, "thumbnails", f"{quote_id}.png")
+
+    def record(self, row, frame):
+        """把当前渲染结果记为这条语录的参考"""
+        quote_id = str(row["id"])
+        path = self._thumbnail_path(quote_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_thumbnail(frame).save(path, "PNG", compress_level=9)
+        self.entries[quote_id] = {
+            "hash": frame_hash(frame),
+            "content": content_hash(row),
+            "size": list(frame.size),
+            "mode": frame.mode,
+            "thumbnail": os.path.relpath(path, self.directory),
+        }
+
+    def compare(self, row, frame, tolerance=0.0):
+        """与参考比较：哈希一致为 identical；否则比较缩略图，最大差异不超过 tolerance 为 within_tolerance"""
+        quote_id = str(row["id"])
+        entry = self.entries.get(quote_id)
+        if entry is None:
+            return VerifyResult(quote_id, STATUS_MISSING, None, None, None)
+        if entry["content"] != content_hash(row):
+            return VerifyResult(quote_id, STATUS_STALE, None, None, None)
+        if entry["hash"] == frame_hash(frame):
+            return VerifyResult(quote_id, STATUS_IDENTICAL, 0.0, 0, None)
+
+        with Image.open(os.path.join(self.directory, entry["thumbnail"])) as stored:
+            reference = stored.convert("RGB")
+        current = make_thumbnail(frame)
+        if current.size != reference.size:
+            current = current.resize(reference.size, Image.Resampling.LANCZOS)
+        mean, maximum, diff = image_difference(reference, current)
+        if tolerance > 0 and maximum <= tolerance:
+            return VerifyResult(quote_id, STATUS_WITHIN_TOLERANCE, mean, maximum, None)
+        return VerifyResult(quote_id, STATUS_DRIFT, mean, maximum, self._write_diff(quote_id, reference, current, diff))
+
+    def _write_diff(self, quote_id, reference, current, diff):
+        """对比图：参考 | 当前 | 放大后的差异"""
+        path = os.path.join(self.directory, "diffs", f"{quote_id}_diff.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        width, height = reference.size
+        sheet = Image.new("RGB", (width * 3, height), (0, 0, 0))
+        sheet.paste(reference, (0, 0))
+        sheet.paste(current, (width, 0))
+        sheet.paste(diff.point(lambda v: min(255, v * DIFF_AMPLIFY)), (width * 2, 0))
+        sheet.save(path, "PNG")
+        return path
+
+    def signature_changes(self, signature):
+        """与录制参考时相比，渲染签名中变化的字段"""
+        if not self.signature:
+            return []
+        return sorted(key for key in set(self.signature) | set(signature)
+                      if self.signature.get(key) != signature.get(key))
@@ -0,0 +1,51 @@
+"""
+自适应抗锯齿校准：超采样倍数越高，相对 4 倍参考的覆盖率误差越小；auto 模式选出的倍数随字号单调不增
+"""
+
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from antialias import (AUTO_MODE, CALIBRATION_CHARS, REFERENCE_FACTOR, AntialiasPolicy,  # noqa: E402
+                       coverage_error, render_glyph_mask)
+from fonts import FontRegistry  # noqa: E402
+
+FONT_PATH = os.path.join(os.path.dirname(SRC_DIR), "resources", "fonts", "SmileySans-Oblique.ttf")
+
+pytestmark = pytest.mark.skipif(not os.path.exists(FONT_PATH), reason="缺少内置字体文件")
+
+
+@pytest.fixture(scope="module")
+def font_registry():
+    return FontRegistry([FONT_PATH])
+
+
+def calibration_error(font_registry, font_size, factor):
+    errors = []
+    for ch in CALIBRATION_CHARS:
+        reference = render_glyph_mask(font_registry, ch, font_size, REFERENCE_FACTOR)
+        errors.append(coverage_error(render_glyph_mask(font_registry, ch, font_size, factor), reference))
+    return sum(errors) / len(errors)
+
+
+@pytest.mark.parametrize("font_size", [24, 35, 80, 110, 141])
+def test_error_falls_as_factor_rises(font_registry, font_size):
+    errors = [calibration_error(font_registry, font_size, factor) for factor in (1, 2, REFERENCE_FACTOR)]
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] == 0
+
+
+def test_reference_shares_candidate_origin(font_registry):
+    """字号不能被 4 整除时，候选与参考仍对齐：原生渲染的误差不应被原点错位放大"""
+    assert calibration_error(font_registry, 35, 1) < 20
+    assert calibration_error(font_registry, 110, 1) < 5
+
+
+def test_auto_factor_does_not_increase_with_size(font_registry):
+    policy = AntialiasPolicy(font_registry, AUTO_MODE)
+    factors = [policy.factor_for(size) for size in (24, 35, 80, 110, 136, 140, 160, 200)]
+    assert factors == sorted(factors, reverse=True)
@@ -0,0 +1,67 @@
+"""
+字形图集：逐字拼贴的结果与 FreeType 整行超采样渲染后缩小的结果一致；图集写盘后载入结果不变
+"""
+
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from fonts import FontRegistry  # noqa: E402
+from glyph_atlas import GlyphAtlas  # noqa: E402
+
+FONT_PATH = os.path.join(os.path.dirname(SRC_DIR), "resources", "fonts", "SmileySans-Oblique.ttf")
+LINES = ["每个人都有自己的时区，不要被别人的节奏打乱。", "Hello, world — 123"]
+
+pytestmark = pytest.mark.skipif(not os.path.exists(FONT_PATH), reason="缺少内置字体文件")
+
+
+@pytest.fixture(scope="module")
+def font_registry():
+    return FontRegistry([FONT_PATH])
+
+
+def render_pair(atlas, font, factor, origin):
+    """同一组行分别用 FreeType 整行绘制后缩小、用图集拼贴，origin 为超采样坐标（含小数）"""
+    width = int(max(font.getlength(line) for line in LINES) + origin[0] * 2)
+    height = int(font.size * 1.7 * len(LINES) + origin[1] * 2)
+    width -= width % factor
+    height -= height % factor
+    reference = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(reference)
+    blitted = Image.new("L", (width // factor, height // factor), 0)
+    for i, line in enumerate(LINES):
+        xy = (origin[0], origin[1] + i * font.size * 1.7)
+        draw.text(xy, line, font=font, fill=255)
+        atlas.blit(blitted, line, xy)
+    if factor > 1:
+        reference = reference.resize(blitted.size, Image.Resampling.LANCZOS)
+    return reference, blitted
+
+
+@pytest.mark.parametrize("font_size, factor", [(24, 4), (27, 4), (40, 4), (80, 2), (110, 1), (160, 4)])
+def test_blit_matches_freetype(font_registry, font_size, factor):
+    font = font_registry.get(font_size * factor)
+    atlas = GlyphAtlas(font, factor)
+    reference, blitted = render_pair(atlas, font, factor, (41.5, 62.3))
+    diff = ImageChops.difference(reference, blitted)
+    assert ImageStat.Stat(diff).mean[0] < 0.05
+    assert diff.getextrema()[1] <= 16
+
+
+def test_saved_atlas_renders_identically(font_registry, tmp_path):
+    font = font_registry.get(24 * 4)
+    atlas = GlyphAtlas(font, 4)
+    _, first = render_pair(atlas, font, 4, (41.5, 62.3))
+    path = str(tmp_path / "atlas.png")
+    atlas.save(path)
+
+    restored = GlyphAtlas(font, 4)
+    assert restored.load(path)
+    _, second = render_pair(restored, font, 4, (41.5, 62.3))
+    assert restored.misses == 0
+    assert ImageChops.difference(first, second).getextrema() == (0, 0)
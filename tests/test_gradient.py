@@ -0,0 +1,50 @@
+"""
+渐变列与原先逐行计算的结果逐字节一致（背景线性渐变和面板 smoothstep 渐变，小高度和 4K 高度）
+"""
+
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from gradient import _panel_column, create_gradient_bg  # noqa: E402
+
+HEIGHTS = [1, 2, 3, 7, 100, 257, 960, 3840]
+BACKGROUND = ((245, 240, 230), (230, 220, 200))
+PANEL = ((255, 255, 255, 90), (250, 245, 235, 60))
+
+
+def baseline_background(height, top_color, bottom_color):
+    """原实现：逐行 ratio = y / height 线性插值后取整"""
+    column = bytearray()
+    for y in range(height):
+        ratio = y / height
+        column += bytes(int(top * (1 - ratio) + bottom * ratio) for top, bottom in zip(top_color, bottom_color))
+    return bytes(column)
+
+
+def baseline_panel(height, top_color, bottom_color):
+    """原实现：逐行 smoothstep 插值后取整"""
+    column = bytearray()
+    for y in range(height):
+        ratio = y / height
+        smooth_ratio = ratio * ratio * (3.0 - 2.0 * ratio)
+        column += bytes(int(top * (1 - smooth_ratio) + bottom * smooth_ratio)
+                        for top, bottom in zip(top_color, bottom_color))
+    return bytes(column)
+
+
+@pytest.mark.parametrize("height", HEIGHTS)
+@pytest.mark.parametrize("colors", [BACKGROUND, ((0, 0, 0), (255, 255, 255)), ((200, 10, 90), (13, 240, 91))])
+def test_background_matches_per_row_loop(height, colors):
+    column = create_gradient_bg(1, height, *colors, mode="RGB")
+    assert column.tobytes() == baseline_background(height, *colors)
+
+
+@pytest.mark.parametrize("height", HEIGHTS)
+@pytest.mark.parametrize("colors", [PANEL, ((0, 0, 0, 0), (255, 255, 255, 255))])
+def test_panel_matches_per_row_loop(height, colors):
+    assert _panel_column(height, *colors).tobytes() == baseline_panel(height, *colors)